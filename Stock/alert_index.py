@@ -0,0 +1,182 @@
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from psycopg2.extras import execute_values
+from database import get_db_connection
+
+ALERT_FLUSH_BATCH = int(os.getenv('ALERT_FLUSH_BATCH', '500'))
+# Postgres NOTIFY channel set_price_alert announces new alert ids on
+ALERT_CHANNEL = 'price_alerts_new'
+
+class _Levels:
+    """Sorted alert thresholds for one symbol and direction"""
+
+    def __init__(self):
+        self.targets = []
+        self.ids = []
+
+    def add(self, target, alert_id):
+        pos = bisect_right(self.targets, target)
+        self.targets.insert(pos, target)
+        self.ids.insert(pos, alert_id)
+
+    def pop_below(self, price):
+        """Remove and return alerts with target < price"""
+        pos = bisect_left(self.targets, price)
+        triggered = self.ids[:pos]
+        del self.targets[:pos]
+        del self.ids[:pos]
+        return triggered
+
+    def pop_above(self, price):
+        """Remove and return alerts with target > price"""
+        pos = bisect_right(self.targets, price)
+        triggered = self.ids[pos:]
+        del self.targets[pos:]
+        del self.ids[pos:]
+        return triggered
+
+class AlertIndex:
+    """In-memory price-level index of untriggered price alerts.
+
+    Alerts are held per symbol in sorted 'above' and 'below' threshold
+    arrays, so each tick finds crossed alerts with a binary search.
+    Triggered alert IDs are written back to price_alerts in batches.
+
+    load_new() picks up alerts with ids above the highest one loaded, and
+    load_ids() loads the ids set_price_alert announces on ALERT_CHANNEL
+    as their inserts commit, including any that commit out of id order.
+    load() rebuilds the index from every untriggered alert, which also
+    drops deleted alerts and catches any announcement that was missed.
+    """
+
+    def __init__(self, batch_size=ALERT_FLUSH_BATCH):
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._above = {}
+        self._below = {}
+        self._known_ids = set()
+        self._max_id = 0
+        self._pending = []
+        # Ids matched while a full load() is reading, so it does not re-add them
+        self._matched_during_load = None
+        self._loaded = False
+
+    def _select(self, condition='', params=()):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, symbol, target_price, alert_type
+                FROM price_alerts
+                WHERE NOT is_triggered {condition}
+            ''', params)
+            return cursor.fetchall()
+
+    def load(self):
+        """Rebuild the index from every untriggered alert; returns the number indexed"""
+        with self._load_lock:
+            with self._lock:
+                self._matched_during_load = set()
+            try:
+                rows = self._select()
+            except Exception:
+                with self._lock:
+                    self._matched_during_load = None
+                raise
+            with self._lock:
+                # Alerts matched here but not yet flushed are still untriggered in the table
+                skip = self._matched_during_load | {alert_id for alert_id, _ in self._pending}
+                self._matched_during_load = None
+                self._above, self._below = {}, {}
+                self._known_ids = set(skip)
+                for row in rows:
+                    if row[0] not in skip:
+                        self._add_locked(*row)
+                self._max_id = max([self._max_id] + [row[0] for row in rows])
+                self._loaded = True
+                return len(self._known_ids) - len(skip)
+
+    def load_new(self):
+        """Add untriggered alerts with ids above the highest loaded; returns how many were added"""
+        with self._load_lock:
+            rows = self._select('AND id > %s', (self._max_id,))
+            added = self._add_rows(rows)
+            if rows:
+                self._max_id = max(self._max_id, max(row[0] for row in rows))
+            return added
+
+    def load_ids(self, alert_ids):
+        """Add the given alerts if they are untriggered; returns how many were added"""
+        with self._load_lock:
+            return self._add_rows(self._select('AND id = ANY(%s)', (list(alert_ids),)))
+
+    def _add_rows(self, rows):
+        with self._lock:
+            return sum(self._add_locked(*row) for row in rows)
+
+    def add(self, alert_id, symbol, target_price, alert_type):
+        """Add a single alert to the index; returns False if it was already known"""
+        with self._lock:
+            return self._add_locked(alert_id, symbol, target_price, alert_type)
+
+    def _add_locked(self, alert_id, symbol, target_price, alert_type):
+        if alert_id in self._known_ids:
+            return False
+        self._known_ids.add(alert_id)
+        levels = self._above if alert_type == 'above' else self._below
+        levels.setdefault(symbol, _Levels()).add(float(target_price), alert_id)
+        return True
+
+    def match(self, symbol, price):
+        """Remove and return IDs of alerts crossed by this price"""
+        if not self._loaded:
+            self.load()
+        with self._lock:
+            triggered = []
+            above = self._above.get(symbol)
+            if above and above.targets and above.targets[0] < price:
+                triggered.extend(above.pop_below(price))
+            below = self._below.get(symbol)
+            if below and below.targets and below.targets[-1] > price:
+                triggered.extend(below.pop_above(price))
+            if triggered:
+                now = datetime.now()
+                self._pending.extend((alert_id, now) for alert_id in triggered)
+                if self._matched_during_load is not None:
+                    self._matched_during_load.update(triggered)
+            pending = len(self._pending)
+
+        if pending >= self.batch_size:
+            self.flush()
+        return triggered
+
+    def flush(self):
+        """Write pending triggered alerts to the database in one statement"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                with get_db_connection() as conn:
+                    cursor = conn.cursor()
+                    execute_values(cursor, '''
+                        UPDATE price_alerts AS a
+                        SET is_triggered = TRUE, triggered_at = v.triggered_at
+                        FROM (VALUES %s) AS v(id, triggered_at)
+                        WHERE a.id = v.id AND NOT a.is_triggered
+                    ''', batch)
+                    conn.commit()
+                return len(batch)
+            except Exception as e:
+                print(f"Error flushing triggered alerts: {e}")
+                with self._lock:
+                    self._pending = batch + self._pending
+                return 0
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
@@ -106,7 +106,8 @@ def calculate_technical_indicators(df):
             return df
 
         # Basic Moving Averages
-        df['SMA20'] = df['Close'].rolling(window=20, min_periods=1).mean()
+        rolling_20 = df['Close'].rolling(window=20, min_periods=1)
+        df['SMA20'] = rolling_20.mean()
         df['SMA50'] = df['Close'].rolling(window=50, min_periods=1).mean()
 
         # RSI
@@ -123,14 +124,14 @@ def calculate_technical_indicators(df):
         df['Signal_Line'] = df['MACD'].ewm(span=9, adjust=False).mean()
         df['MACD_Histogram'] = df['MACD'] - df['Signal_Line']
 
-        # Bollinger Bands
-        df['BB_middle'] = df['Close'].rolling(window=20, min_periods=1).mean()
-        std = df['Close'].rolling(window=20, min_periods=1).std()
-        df['BB_upper'] = df['BB_middle'] + 2 * std
-        df['BB_lower'] = df['BB_middle'] - 2 * std
+        # Bollinger Bands (the middle band is the 20-day SMA)
+        df['BB_middle'] = df['SMA20']
+        std = rolling_20.std()
+        df['BB_upper'] = df['SMA20'] + 2 * std
+        df['BB_lower'] = df['SMA20'] - 2 * std
 
         # Fill NaN values with first valid observation
-        df.fillna(method='bfill', inplace=True)
+        df.bfill(inplace=True)
 
         return df
 
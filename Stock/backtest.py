@@ -0,0 +1,207 @@
+"""Vectorized backtests of indicator strategies on cached daily history.
+
+A strategy turns a time x symbol close panel into target positions (1 for
+long, 0 for flat) with array operations. run_backtest holds each position
+from the bar after the signal, charges commission and slippage on every
+change, and averages the symbols into an equal-weight portfolio. sweep()
+runs a parameter grid across a process pool.
+
+    python backtest.py sma_cross --symbols AAPL,MSFT,NVDA --period 10y
+    python backtest.py rsi_threshold --synthetic 500 --param lower=20,25,30 --param upper=70,80
+"""
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from panel_indicators import ewm, rolling_mean, rsi
+
+PERIODS_PER_YEAR = 252
+COMMISSION_BPS = float(os.getenv('BACKTEST_COMMISSION_BPS', '1'))
+SLIPPAGE_BPS = float(os.getenv('BACKTEST_SLIPPAGE_BPS', '5'))
+BACKTEST_WORKERS = int(os.getenv('BACKTEST_WORKERS', str(os.cpu_count() or 1)))
+
+def sma_cross(close, fast=20, slow=50):
+    """Long while the fast SMA is above the slow SMA"""
+    return (rolling_mean(close, fast) > rolling_mean(close, slow)).astype('float64')
+
+def rsi_threshold(close, window=14, lower=30, upper=70):
+    """Go long when RSI falls below lower, exit when it rises above upper"""
+    levels = rsi(close, window)
+    signal = np.where(levels < lower, 1.0, np.where(levels > upper, 0.0, np.nan))
+    # Between the thresholds the last entry/exit signal still holds
+    return pd.DataFrame(signal).ffill().fillna(0.0).to_numpy()
+
+def macd_cross(close, fast=12, slow=26, signal=9):
+    """Long while MACD is above its signal line"""
+    macd = ewm(close, fast) - ewm(close, slow)
+    positions = (macd > ewm(macd, signal)).astype('float64')
+    positions[np.isnan(close)] = 0.0
+    return positions
+
+STRATEGIES = {
+    'sma_cross': sma_cross,
+    'rsi_threshold': rsi_threshold,
+    'macd_cross': macd_cross
+}
+
+# Default sweeps of about 100 parameter sets each
+DEFAULT_GRIDS = {
+    'sma_cross': {'fast': list(range(5, 55, 5)), 'slow': list(range(60, 260, 20))},
+    'rsi_threshold': {'window': [7, 14, 21], 'lower': [20, 25, 30, 35], 'upper': [60, 65, 70, 75, 80]},
+    'macd_cross': {'fast': [8, 10, 12, 14], 'slow': [21, 26, 30, 35], 'signal': [5, 7, 9, 11]}
+}
+
+def parameter_grid(**ranges):
+    """Every combination of the given parameter values, as a list of dicts
+
+    Combinations with fast >= slow are skipped.
+    """
+    names = list(ranges)
+    grid = [dict(zip(names, values)) for values in itertools.product(*ranges.values())]
+    return [params for params in grid if params.get('fast', 0) < params.get('slow', np.inf)]
+
+def bar_returns(close):
+    """Close-to-close returns, 0 where either bar is missing"""
+    close = np.asarray(close, dtype='float64')
+    returns = np.zeros(close.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = close[1:] / close[:-1] - 1
+    returns[~np.isfinite(returns)] = 0.0
+    return returns
+
+def performance_metrics(returns, periods_per_year=PERIODS_PER_YEAR):
+    """Summary statistics of a portfolio's per-bar returns"""
+    returns = np.asarray(returns, dtype='float64')
+    equity = np.cumprod(1 + returns)
+    years = len(returns) / periods_per_year
+    volatility = returns.std() * np.sqrt(periods_per_year)
+    return {
+        'total_return': equity[-1] - 1,
+        'cagr': equity[-1] ** (1 / years) - 1 if years and equity[-1] > 0 else np.nan,
+        'volatility': volatility,
+        'sharpe': returns.mean() * periods_per_year / volatility if volatility else 0.0,
+        'max_drawdown': (equity / np.maximum.accumulate(equity) - 1).min()
+    }
+
+def run_backtest(close, positions, commission_bps=COMMISSION_BPS, slippage_bps=SLIPPAGE_BPS, returns=None):
+    """Equal-weight portfolio backtest of target positions
+
+    positions[t] is decided at the close of bar t and earns bar t + 1's
+    return. Each unit of position change costs commission plus slippage
+    (in basis points of the traded value). Symbols count towards the
+    portfolio only on bars where they have a close.
+
+    Returns {'returns': per-bar portfolio returns, 'equity': equity curve,
+    'symbol_returns': time x symbol returns, 'metrics': summary}.
+    """
+    index = close.index if isinstance(close, pd.DataFrame) else None
+    symbols = close.columns if isinstance(close, pd.DataFrame) else None
+    c = np.asarray(close, dtype='float64')
+    if returns is None:
+        returns = bar_returns(c)
+    positions = np.asarray(positions, dtype='float64')
+
+    held = np.zeros(positions.shape)
+    held[1:] = positions[:-1]
+    turnover = np.abs(np.diff(positions, axis=0, prepend=0.0))
+    symbol_returns = held * returns - turnover * (commission_bps + slippage_bps) / 10000
+
+    listed = ~np.isnan(c)
+    counts = listed.sum(axis=1)
+    portfolio = np.where(listed, symbol_returns, 0.0).sum(axis=1) / np.maximum(counts, 1)
+
+    metrics = performance_metrics(portfolio)
+    metrics['trades'] = int(turnover.sum())
+    metrics['exposure'] = held[listed].mean() if listed.any() else 0.0
+    return {
+        'returns': pd.Series(portfolio, index=index),
+        'equity': pd.Series(np.cumprod(1 + portfolio), index=index),
+        'symbol_returns': pd.DataFrame(symbol_returns, index=index, columns=symbols),
+        'metrics': metrics
+    }
+
+# Per-process copy of the panel, set once by the pool initializer
+_worker_state = {}
+
+def _init_worker(close):
+    _worker_state['close'] = close
+    _worker_state['returns'] = bar_returns(close)
+
+def _run_params(strategy, params, commission_bps, slippage_bps):
+    close = _worker_state['close']
+    positions = STRATEGIES[strategy](close, **params)
+    result = run_backtest(close, positions, commission_bps, slippage_bps, returns=_worker_state['returns'])
+    return {**params, **result['metrics']}
+
+def sweep(close, strategy, grid, commission_bps=COMMISSION_BPS, slippage_bps=SLIPPAGE_BPS, workers=BACKTEST_WORKERS):
+    """Backtest every parameter set in grid; returns a metrics frame sorted by Sharpe ratio
+
+    The close panel is sent to each worker once, when the pool starts.
+    """
+    close = np.asarray(close, dtype='float64')
+    if workers <= 1 or len(grid) <= 1:
+        _init_worker(close)
+        rows = [_run_params(strategy, params, commission_bps, slippage_bps) for params in grid]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(close,)) as executor:
+            rows = list(executor.map(
+                _run_params, itertools.repeat(strategy), grid,
+                itertools.repeat(commission_bps), itertools.repeat(slippage_bps),
+                chunksize=max(1, len(grid) // (workers * 4))
+            ))
+    return pd.DataFrame(rows).sort_values('sharpe', ascending=False, ignore_index=True)
+
+def synthetic_close(symbols, sessions, seed=0):
+    """Seeded random-walk daily closes for a number of symbols"""
+    rng = np.random.default_rng(seed)
+    sigma = rng.uniform(0.01, 0.03, symbols)
+    drift = rng.normal(0.0002, 0.0005, symbols)
+    steps = rng.normal(drift - sigma ** 2 / 2, sigma, (sessions, symbols))
+    return pd.DataFrame(
+        100 * np.exp(np.cumsum(steps, axis=0)),
+        index=pd.bdate_range(end='2024-12-31', periods=sessions),
+        columns=[f'SYM{i:04d}' for i in range(symbols)]
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest an indicator strategy over a parameter grid")
+    parser.add_argument('strategy', choices=sorted(STRATEGIES))
+    parser.add_argument('--symbols', help="Comma-separated symbols (default: every cached symbol)")
+    parser.add_argument('--period', default='10y', help="History to load, e.g. 1y, 5y, 10y")
+    parser.add_argument('--synthetic', type=int, metavar='N', help="Use N random-walk symbols instead of stored history")
+    parser.add_argument('--sessions', type=int, default=2520, help="Daily bars per synthetic symbol")
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=V1,V2',
+                        help="Values to sweep for a parameter (replaces its default range)")
+    parser.add_argument('--commission-bps', type=float, default=COMMISSION_BPS)
+    parser.add_argument('--slippage-bps', type=float, default=SLIPPAGE_BPS)
+    parser.add_argument('--workers', type=int, default=BACKTEST_WORKERS)
+    parser.add_argument('--top', type=int, default=10, help="Parameter sets to print")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        close = synthetic_close(args.synthetic, args.sessions)
+    else:
+        from screener import load_history_panels
+        symbols = [s.strip().upper() for s in args.symbols.split(',')] if args.symbols else None
+        panels = load_history_panels(symbols, args.period)
+        if panels is None:
+            print("No cached history for these symbols")
+            return 1
+        close = panels['close']
+
+    ranges = dict(DEFAULT_GRIDS[args.strategy])
+    for spec in args.param:
+        name, _, values = spec.partition('=')
+        ranges[name] = [float(v) if '.' in v else int(v) for v in values.split(',')]
+    grid = parameter_grid(**ranges)
+
+    print(f"Backtesting {args.strategy}: {len(grid)} parameter sets on {close.shape[1]} symbols x {close.shape[0]} bars")
+    results = sweep(close, args.strategy, grid, args.commission_bps, args.slippage_bps, args.workers)
+    with pd.option_context('display.width', 160, 'display.max_columns', None):
+        print(results.head(args.top).to_string(float_format=lambda v: f'{v:.4f}'))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
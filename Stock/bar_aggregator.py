@@ -0,0 +1,211 @@
+"""Roll streaming trades into intraday OHLCV bars and persist them.
+
+BarAggregator keeps one open bar per symbol and bar size in memory, for
+ticks in the regular session only; extended-hours trades are skipped.
+A tick for a later bar closes the open one, and so does close_due() once
+the bar's time has passed, so quiet symbols still get their bars written.
+Completed bars are written in bulk to intraday_bars. That table is
+range-partitioned by month on bar_time, and each month's partition is
+created the first time a bar for that month is written, under an advisory
+lock so concurrent writers do not race on the DDL. Bars backfilled
+from yfinance are flagged, and aggregated bars never overwrite them.
+
+Bar times are naive exchange (New York) wall-clock times, matching the
+intraday bars yfinance returns after normalize_history.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import pandas as pd
+from psycopg2.extras import execute_values
+from database import get_db_connection
+
+# Bar sizes in seconds; 5m and 15m boundaries line up with the clock since
+# the exchange's UTC offset is a whole number of hours
+BAR_INTERVALS = {'1m': 60, '5m': 300, '15m': 900}
+MARKET_TZ = 'America/New_York'
+# Regular session in exchange time
+SESSION_OPEN = pd.Timedelta(hours=9, minutes=30)
+SESSION_CLOSE = pd.Timedelta(hours=16)
+# pg_advisory_xact_lock key serializing partition creation
+PARTITION_LOCK_KEY = 7305001
+# Seconds after a bar ends before close_due() treats it as complete,
+# so ticks that arrive slightly late still land in it
+BAR_CLOSE_GRACE = float(os.getenv('BAR_CLOSE_GRACE', '2'))
+
+class BarAggregator:
+    """In-memory OHLCV bars for every symbol at each bar size"""
+
+    def __init__(self, intervals=BAR_INTERVALS, grace=BAR_CLOSE_GRACE):
+        self.intervals = dict(intervals)
+        self.grace = grace
+        # (symbol, interval) -> [start epoch, open, high, low, close, volume]
+        self._open = {}
+        self._completed = []
+        # Epoch bounds of the exchange day last seen and of its session
+        self._day = (0.0, 0.0, 0.0, 0.0)
+        self._zone = ZoneInfo(MARKET_TZ)
+        self.late_ticks = 0
+        self.outside_session_ticks = 0
+
+    def in_session(self, timestamp):
+        """Whether an epoch timestamp falls in a weekday's regular session"""
+        if not self._day[0] <= timestamp < self._day[1]:
+            local = datetime.fromtimestamp(timestamp, self._zone)
+            midnight = local.replace(hour=0, minute=0, second=0, microsecond=0)
+            if local.weekday() >= 5:
+                opens = closes = midnight
+            else:
+                opens, closes = midnight + SESSION_OPEN, midnight + SESSION_CLOSE
+            self._day = (
+                midnight.timestamp(), (midnight + timedelta(days=1)).timestamp(),
+                opens.timestamp(), closes.timestamp()
+            )
+        return self._day[2] <= timestamp < self._day[3]
+
+    def add(self, symbol, price, volume, timestamp):
+        """Add a tick at an epoch timestamp; volume is the traded size of the tick"""
+        if not self.in_session(timestamp):
+            self.outside_session_ticks += 1
+            return
+        for interval, seconds in self.intervals.items():
+            start = int(timestamp // seconds) * seconds
+            key = (symbol, interval)
+            bar = self._open.get(key)
+            if bar is None or start > bar[0]:
+                if bar is not None:
+                    self._completed.append((symbol, interval, *bar))
+                self._open[key] = [start, price, price, price, price, volume]
+            elif start == bar[0]:
+                bar[2] = max(bar[2], price)
+                bar[3] = min(bar[3], price)
+                bar[4] = price
+                bar[5] += volume
+            else:
+                # Its bar was already closed and handed off for writing
+                self.late_ticks += 1
+
+    def close_due(self, now):
+        """Close open bars that ended more than grace seconds before now"""
+        for key, bar in list(self._open.items()):
+            if bar[0] + self.intervals[key[1]] + self.grace <= now:
+                self._completed.append((*key, *bar))
+                del self._open[key]
+
+    def close_all(self):
+        """Close every open bar, e.g. on shutdown"""
+        self._completed.extend((*key, *bar) for key, bar in self._open.items())
+        self._open.clear()
+
+    def drain(self):
+        """Completed bars as (symbol, interval, start epoch, open, high, low, close, volume) tuples"""
+        completed, self._completed = self._completed, []
+        return completed
+
+    def open_bars(self):
+        return len(self._open)
+
+def to_bar_time(epoch_seconds):
+    """Naive exchange-time timestamps for epoch seconds"""
+    return pd.to_datetime(epoch_seconds, unit='s', utc=True).tz_convert(MARKET_TZ).tz_localize(None)
+
+# Monthly partitions known to exist in this process
+_partitions = set()
+_partitions_lock = threading.Lock()
+
+def partition_name(month):
+    return f"intraday_bars_{month:%Y%m}"
+
+def ensure_partitions(cursor, bar_times):
+    """Create the monthly intraday_bars partitions covering bar_times"""
+    months = {ts.to_period('M').start_time for ts in pd.DatetimeIndex(bar_times)}
+    with _partitions_lock:
+        missing = sorted(months - _partitions)
+    if missing:
+        # Held until the transaction ends, so the partitions are created
+        # and committed by one writer at a time
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', (PARTITION_LOCK_KEY,))
+    for month in missing:
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {partition_name(month)}
+            PARTITION OF intraday_bars
+            FOR VALUES FROM (%s) TO (%s)
+        ''', (month.to_pydatetime(), (month + pd.DateOffset(months=1)).to_pydatetime()))
+    with _partitions_lock:
+        _partitions.update(missing)
+
+def store_intraday_bars(bars):
+    """Bulk upsert aggregated bars as returned by BarAggregator.drain(); returns rows written"""
+    if not bars:
+        return 0
+    times = to_bar_time([bar[2] for bar in bars])
+    rows = [
+        (symbol, interval, ts.to_pydatetime(), float(o), float(h), float(l), float(c), int(v))
+        for (symbol, interval, _, o, h, l, c, v), ts in zip(bars, times)
+    ]
+    return _upsert_bars(rows, times, backfilled=False)
+
+def store_intraday_frame(symbol, interval, hist):
+    """Bulk upsert a normalized yfinance intraday OHLCV frame as backfilled bars"""
+    if hist.empty:
+        return 0
+    rows = [
+        (symbol, interval, ts.to_pydatetime(), float(o), float(h), float(l), float(c), int(v))
+        for ts, o, h, l, c, v in zip(
+            hist.index, hist['Open'], hist['High'], hist['Low'],
+            hist['Close'], hist['Volume']
+        )
+    ]
+    return _upsert_bars(rows, hist.index, backfilled=True)
+
+def _upsert_bars(rows, bar_times, backfilled):
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            ensure_partitions(cursor, bar_times)
+            # Backfilled bars replace anything; aggregated bars only replace aggregated ones
+            execute_values(cursor, '''
+                INSERT INTO intraday_bars
+                (symbol, bar_interval, bar_time, open_price, high_price, low_price, close_price, volume, backfilled)
+                VALUES %s
+                ON CONFLICT (symbol, bar_interval, bar_time)
+                DO UPDATE SET
+                    open_price = EXCLUDED.open_price,
+                    high_price = EXCLUDED.high_price,
+                    low_price = EXCLUDED.low_price,
+                    close_price = EXCLUDED.close_price,
+                    volume = EXCLUDED.volume,
+                    backfilled = EXCLUDED.backfilled
+                WHERE EXCLUDED.backfilled OR NOT intraday_bars.backfilled
+            ''', [row + (backfilled,) for row in rows], page_size=1000)
+            conn.commit()
+        return len(rows)
+    except Exception as e:
+        with _partitions_lock:
+            # A rolled-back transaction may have undone partition DDL
+            _partitions.clear()
+        print(f"Error storing intraday bars: {e}")
+        return 0
+
+def load_intraday_bars(symbol, interval, start):
+    """Stored bars for a symbol and bar size since start, as an OHLCV frame"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT bar_time, open_price, high_price, low_price, close_price, volume
+            FROM intraday_bars
+            WHERE symbol = %s AND bar_interval = %s AND bar_time >= %s
+            ORDER BY bar_time
+        ''', (symbol, interval, start.to_pydatetime()))
+        rows = cursor.fetchall()
+
+    hist = pd.DataFrame(
+        [row[1:] for row in rows],
+        index=pd.DatetimeIndex([row[0] for row in rows], name='Date'),
+        columns=['Open', 'High', 'Low', 'Close', 'Volume']
+    )
+    return hist.astype({
+        'Open': 'float64', 'High': 'float64', 'Low': 'float64',
+        'Close': 'float64', 'Volume': 'int64'
+    })
@@ -0,0 +1,176 @@
+"""Local columnar OHLCV store with memory-mapped reads.
+
+Each symbol and bar size gets its own directory of raw little-endian
+column files plus a meta.json:
+
+    <root>/<SYMBOL>/<interval>/time.i8     nanoseconds since the epoch (naive, exchange time)
+                              /open.f8 high.f8 low.f8 close.f8 volume.i8
+                              /meta.json   {"rows": n, "updated_at": epoch seconds,
+                                            "first_available": ISO time or null}
+
+Reads map the column files copy-on-write with np.memmap and wrap them in
+a DataFrame without copying, so only the pages that are touched are
+loaded. Writes
+are append-only: new bars must be later than the last stored bar, except
+that a bar with the same time as the last one replaces it (a session
+still in progress). meta.json is written last and atomically, so a
+reader never sees rows beyond the last complete append. first_available
+records the earliest bar the data source has, when that is known to be
+later than what was asked for (e.g. a recently listed symbol).
+"""
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    ('Open', 'open.f8', '<f8'),
+    ('High', 'high.f8', '<f8'),
+    ('Low', 'low.f8', '<f8'),
+    ('Close', 'close.f8', '<f8'),
+    ('Volume', 'volume.i8', '<i8')
+]
+TIME_FILE = 'time.i8'
+META_FILE = 'meta.json'
+
+class BarStore:
+    """Append-only per-symbol, per-interval bar files under a root directory"""
+
+    def __init__(self, root):
+        self.root = root
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _dir(self, symbol, interval):
+        return os.path.join(self.root, symbol.upper(), interval)
+
+    def _lock(self, symbol, interval):
+        key = (symbol.upper(), interval)
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def meta(self, symbol, interval):
+        """Stored metadata, or None if nothing is stored"""
+        try:
+            with open(os.path.join(self._dir(symbol, interval), META_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def age(self, symbol, interval):
+        """Seconds since the last write, or None if nothing is stored"""
+        meta = self.meta(symbol, interval)
+        return time.time() - meta['updated_at'] if meta else None
+
+    def first_available(self, symbol, interval):
+        """Earliest bar the source has, if recorded by replace(), else None"""
+        meta = self.meta(symbol, interval)
+        value = meta.get('first_available') if meta else None
+        return pd.Timestamp(value) if value else None
+
+    def _write_meta(self, path, rows, first_available=None):
+        tmp = os.path.join(path, META_FILE + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'rows': rows, 'updated_at': time.time(), 'first_available': first_available}, f)
+        os.replace(tmp, os.path.join(path, META_FILE))
+
+    def _map(self, path, name, dtype, rows):
+        # Copy-on-write mapping: callers may modify the frame without touching the file.
+        # A plain ndarray view, so results of arithmetic are not memmaps.
+        return np.memmap(os.path.join(path, name), dtype=dtype, mode='c', shape=(rows,)).view(np.ndarray)
+
+    def read(self, symbol, interval, start=None, end=None):
+        """Bars with start <= time < end as a DataFrame backed by the mapped files"""
+        meta = self.meta(symbol, interval)
+        rows = meta['rows'] if meta else 0
+        if rows == 0:
+            return pd.DataFrame(
+                {column: np.empty(0, dtype) for column, _, dtype in COLUMNS},
+                index=pd.DatetimeIndex([], name='Date')
+            )
+
+        path = self._dir(symbol, interval)
+        times = self._map(path, TIME_FILE, '<i8', rows)
+        lo = 0 if start is None else int(np.searchsorted(times, pd.Timestamp(start).value, side='left'))
+        hi = rows if end is None else int(np.searchsorted(times, pd.Timestamp(end).value, side='left'))
+
+        index = pd.DatetimeIndex(times[lo:hi].view('datetime64[ns]'), name='Date', copy=False)
+        data = {
+            column: self._map(path, name, dtype, rows)[lo:hi]
+            for column, name, dtype in COLUMNS
+        }
+        return pd.DataFrame(data, index=index, copy=False)
+
+    def _columns(self, frame):
+        index = pd.DatetimeIndex(frame.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        arrays = {TIME_FILE: index.as_unit('ns').asi8.astype('<i8')}
+        for column, name, dtype in COLUMNS:
+            arrays[name] = frame[column].to_numpy(dtype=dtype)
+        return arrays
+
+    def append(self, symbol, interval, frame):
+        """Append bars later than the last stored one; returns the number of rows written
+
+        A leading bar at the same time as the last stored bar replaces it.
+        Earlier bars are ignored.
+        """
+        if frame.empty:
+            return 0
+        with self._lock(symbol, interval):
+            path = self._dir(symbol, interval)
+            os.makedirs(path, exist_ok=True)
+            meta = self.meta(symbol, interval)
+            rows = meta['rows'] if meta else 0
+            arrays = self._columns(frame.sort_index())
+
+            keep = rows
+            new_times = arrays[TIME_FILE]
+            if rows:
+                last = int(self._map(path, TIME_FILE, '<i8', rows)[-1])
+                skip = int(np.searchsorted(new_times, last, side='left'))
+                if skip < len(new_times) and new_times[skip] == last:
+                    keep -= 1
+                arrays = {name: values[skip:] for name, values in arrays.items()}
+            if len(arrays[TIME_FILE]) == 0:
+                return 0
+
+            for name, values in arrays.items():
+                with open(os.path.join(path, name), 'r+b' if rows else 'wb') as f:
+                    f.seek(keep * values.itemsize)
+                    f.write(values.tobytes())
+                    f.truncate()
+            written = len(arrays[TIME_FILE])
+            self._write_meta(path, keep + written, meta.get('first_available') if meta else None)
+            return written
+
+    def replace(self, symbol, interval, frame, first_available=None):
+        """Overwrite everything stored for a symbol and interval
+
+        first_available is the earliest bar the source has, when known.
+        """
+        with self._lock(symbol, interval):
+            path = self._dir(symbol, interval)
+            os.makedirs(path, exist_ok=True)
+            arrays = self._columns(frame.sort_index())
+            # Hide the old rows first so no reader maps a shorter new file with the old count
+            self._write_meta(path, 0)
+            for name, values in arrays.items():
+                tmp = os.path.join(path, name + '.tmp')
+                values.tofile(tmp)
+                # Readers holding the old mapping keep the old file
+                os.replace(tmp, os.path.join(path, name))
+            self._write_meta(path, len(frame), pd.Timestamp(first_available).isoformat() if first_available is not None else None)
+            return len(frame)
+
+    def symbols(self, interval):
+        """Symbols with bars stored at the given interval"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            symbol for symbol in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, symbol, interval, META_FILE))
+        )
@@ -0,0 +1,238 @@
+"""Benchmarks for the analytics hot paths.
+
+Runs the indicator, volume profile, portfolio valuation and chart code on
+seeded synthetic data (1 month of daily bars up to 10 years of 1-minute
+bars, and portfolios of 1 to 10,000 lots), recording the median time and
+the peak traced memory of each case. Needs no database or network.
+
+    python benchmarks.py --save-baseline
+    python benchmarks.py --compare
+    python benchmarks.py --filter indicators --repeat 5
+"""
+import argparse
+import contextlib
+import functools
+import importlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import stock_utils
+from chart_utils import build_macd_chart, build_price_chart, build_rsi_chart
+from market_simulator import random_walk_bars, symbol_universe
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+SENTINEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'attached_assets', 'StockSentinel')
+
+# (name, sessions, bars per session)
+FRAME_SIZES = [
+    ('1mo_daily', 21, 1),
+    ('1y_daily', 252, 1),
+    ('10y_daily', 2520, 1),
+    ('1y_1m', 252, 390),
+    ('10y_1m', 2520, 390)
+]
+PORTFOLIO_SIZES = [1, 100, 1000, 10000]
+# Frame sizes the chart builders are benchmarked on
+CHART_SIZES = ['1y_daily', '10y_daily', '1y_1m', '10y_1m']
+
+def synthetic_frame(sessions, bars_per_session, seed=0):
+    """Seeded OHLCV frame of daily bars, or minute bars within 9:30-16:00 sessions"""
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(end='2024-12-31', periods=sessions)
+    if bars_per_session == 1:
+        index = days
+        sigma = 0.02
+    else:
+        minutes = pd.to_timedelta(570 + np.arange(bars_per_session), unit='min')
+        index = pd.DatetimeIndex((days.values[:, None] + minutes.values[None, :]).ravel())
+        sigma = 0.02 / np.sqrt(bars_per_session)
+    frame = pd.DataFrame(random_walk_bars(rng, 100.0, len(index), sigma), index=index)
+    frame.index.name = 'Date'
+    return frame
+
+def synthetic_portfolio(lots, seed=0):
+    """Portfolio rows over up to 500 symbols, plus a price for each symbol"""
+    rng = np.random.default_rng(seed)
+    symbols = symbol_universe(min(lots, 500))
+    picks = rng.integers(0, len(symbols), lots)
+    rows = [
+        (symbols[i], float(shares), float(price), '2024-01-02')
+        for i, shares, price in zip(picks, rng.integers(1, 500, lots), rng.uniform(10, 500, lots))
+    ]
+    prices = {symbol: float(price) for symbol, price in zip(symbols, rng.uniform(10, 500, len(symbols)))}
+    return rows, prices
+
+def load_sentinel_indicators():
+    """StockSentinel's calculate_technical_indicators, or None if its dependencies are missing
+
+    StockSentinel has its own top-level `database` package, so it is
+    imported with this app's module of the same name set aside.
+    """
+    def sentinel_names():
+        return [name for name in sys.modules if name.split('.')[0] in ('database', 'utils')]
+
+    shadowed = {name: sys.modules.pop(name) for name in sentinel_names()}
+    sys.path.insert(0, SENTINEL_DIR)
+    try:
+        return importlib.import_module('utils.stock_data').calculate_technical_indicators
+    except ImportError as e:
+        print(f"Skipping StockSentinel indicators: {e}")
+        return None
+    finally:
+        sys.path.remove(SENTINEL_DIR)
+        for name in sentinel_names():
+            del sys.modules[name]
+        sys.modules.update(shadowed)
+
+@functools.lru_cache(maxsize=None)
+def frame_for(size):
+    """Synthetic frame for a FRAME_SIZES name, built on first use"""
+    _, sessions, per_session = next(entry for entry in FRAME_SIZES if entry[0] == size)
+    return synthetic_frame(sessions, per_session)
+
+@functools.lru_cache(maxsize=None)
+def indicators_for(size):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return stock_utils.calculate_technical_indicators(frame_for(size).copy())
+
+@functools.lru_cache(maxsize=None)
+def sentinel_indicators():
+    return load_sentinel_indicators()
+
+def build_cases(selected=None):
+    """Benchmark cases as (name, prepare); prepare() returns (setup, func), or None to skip
+
+    setup() returns func's arguments. Frames, portfolios and the
+    StockSentinel import are only built by prepare(), so filtering out
+    a case also skips building its data.
+    """
+    cases = []
+    for size, _, _ in FRAME_SIZES:
+        cases.append((f'indicators/{size}', lambda s=size: (
+            lambda: (frame_for(s).copy(),), stock_utils.calculate_technical_indicators
+        )))
+        cases.append((f'sentinel_indicators/{size}', lambda s=size: (
+            (lambda: (frame_for(s).copy(),), sentinel_indicators())
+            if sentinel_indicators() is not None else None
+        )))
+        cases.append((f'volume_profile/{size}', lambda s=size: (
+            lambda: (frame_for(s),), stock_utils.calculate_volume_profile
+        )))
+        cases.append((f'volume_profile_range/{size}', lambda s=size: (
+            lambda: (frame_for(s),),
+            lambda data: stock_utils.calculate_volume_profile(data, weight_by_range=True)
+        )))
+
+        if size in CHART_SIZES:
+            cases.append((f'price_chart/{size}', lambda s=size: (lambda: ('BENCH', indicators_for(s)), build_price_chart)))
+            cases.append((f'rsi_chart/{size}', lambda s=size: (lambda: (indicators_for(s),), build_rsi_chart)))
+            cases.append((f'macd_chart/{size}', lambda s=size: (lambda: (indicators_for(s),), build_macd_chart)))
+            cases.append((f'technical_figure/{size}', lambda s=size: (
+                lambda: (indicators_for(s),), stock_utils.render_technical_indicators
+            )))
+
+    for lots in PORTFOLIO_SIZES:
+        cases.append((f'portfolio/{lots}_lots', lambda n=lots: (
+            lambda portfolio=synthetic_portfolio(n): portfolio, stock_utils.value_portfolio
+        )))
+
+    if selected:
+        cases = [case for case in cases if selected in case[0]]
+    return cases
+
+def measure(setup, func, repeat):
+    """Median wall time over repeat runs, and peak traced memory of one extra run"""
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Warm-up run so lazy imports and caches are not counted
+        func(*setup())
+        args = setup()
+        tracemalloc.start()
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        for _ in range(repeat):
+            args = setup()
+            started = time.perf_counter()
+            func(*args)
+            timings.append(time.perf_counter() - started)
+    return {'seconds': statistics.median(timings), 'peak_bytes': peak}
+
+def run(selected=None, repeat=5):
+    results = {}
+    for name, prepare in build_cases(selected):
+        case = prepare()
+        if case is None:
+            continue
+        results[name] = measure(*case, repeat)
+        print(f"{name:<36} {results[name]['seconds'] * 1000:>10.2f} ms {results[name]['peak_bytes'] / 2**20:>9.2f} MB")
+    return results
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine()
+    }
+
+def save_baseline(results, path=BASELINE_PATH):
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2, sort_keys=True)
+    print(f"Saved baseline for {len(results)} cases to {path}")
+
+def compare(results, path=BASELINE_PATH, tolerance=0.2):
+    """Print changes against a saved baseline; returns the names of regressed cases
+
+    A case regresses when its time or peak memory exceeds the baseline by
+    more than tolerance (a fraction).
+    """
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get('environment') != environment():
+        print(f"Note: baseline was recorded with {baseline.get('environment')}")
+
+    regressions = []
+    print(f"\n{'case':<36} {'time':>9} {'memory':>9}")
+    for name, result in results.items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f"{name:<36} {'new':>9} {'new':>9}")
+            continue
+        time_change = result['seconds'] / before['seconds'] - 1 if before['seconds'] else 0.0
+        memory_change = result['peak_bytes'] / before['peak_bytes'] - 1 if before['peak_bytes'] else 0.0
+        regressed = time_change > tolerance or memory_change > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<36} {time_change:>+9.1%} {memory_change:>+9.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analytics hot paths")
+    parser.add_argument('--filter', help="Only run cases whose name contains this text")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per case")
+    parser.add_argument('--save-baseline', nargs='?', const=BASELINE_PATH, metavar='PATH')
+    parser.add_argument('--compare', nargs='?', const=BASELINE_PATH, metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown/growth as a fraction")
+    args = parser.parse_args()
+
+    results = run(args.filter, args.repeat)
+    if args.save_baseline:
+        save_baseline(results, args.save_baseline)
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
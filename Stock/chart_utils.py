@@ -0,0 +1,200 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Roughly the pixel width of a full-width chart
+CHART_MAX_POINTS = int(os.getenv('CHART_MAX_POINTS', '1500'))
+# Line series longer than this are drawn with WebGL
+WEBGL_THRESHOLD = int(os.getenv('WEBGL_THRESHOLD', '1000'))
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling
+
+    Returns the positions of the points to keep. The first and last
+    points are always kept; each bucket in between keeps the point that
+    forms the largest triangle with the previously kept point and the
+    average of the next bucket.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    bounds = (np.floor(np.arange(threshold - 1) * every) + 1).astype(np.int64)
+    bounds[-1] = n - 1
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = bounds[i], bounds[i + 1]
+        next_end = bounds[i + 2] if i + 2 < len(bounds) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+def _x_values(index):
+    if isinstance(index, pd.DatetimeIndex):
+        values = index.asi8
+        return (values - values[0]).astype('float64')
+    return np.asarray(index, dtype='float64')
+
+def reduce_series(series, max_points=CHART_MAX_POINTS):
+    """Downsample a line series with LTTB, skipping leading/trailing NaNs"""
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series.index, series.to_numpy()
+    values = series.to_numpy(dtype='float64')
+    kept = lttb_indices(_x_values(series.index), values, max_points)
+    return series.index[kept], values[kept]
+
+def downsample_ohlc(data, max_points=CHART_MAX_POINTS):
+    """Aggregate OHLCV bars into at most max_points buckets of consecutive bars"""
+    n = len(data)
+    if n <= max_points:
+        return data[['Open', 'High', 'Low', 'Close', 'Volume']]
+
+    size = int(np.ceil(n / max_points))
+    starts = np.arange(0, n, size)
+    ends = np.minimum(starts + size, n) - 1
+    return pd.DataFrame({
+        'Open': data['Open'].to_numpy()[starts],
+        'High': np.maximum.reduceat(data['High'].to_numpy(), starts),
+        'Low': np.minimum.reduceat(data['Low'].to_numpy(), starts),
+        'Close': data['Close'].to_numpy()[ends],
+        'Volume': np.add.reduceat(data['Volume'].to_numpy(), starts)
+    }, index=data.index[starts])
+
+def line_trace(x, y, **kwargs):
+    """Scatter trace that switches to WebGL for long series"""
+    if len(x) > WEBGL_THRESHOLD:
+        return go.Scattergl(x=x, y=y, mode='lines', **kwargs)
+    return go.Scatter(x=x, y=y, mode='lines', **kwargs)
+
+def reduced_line_trace(series, max_points=CHART_MAX_POINTS, **kwargs):
+    x, y = reduce_series(series, max_points)
+    return line_trace(x, y, **kwargs)
+
+def build_price_chart(symbol, data, max_points=CHART_MAX_POINTS):
+    """Candlestick chart with Bollinger bands and moving averages"""
+    candles = downsample_ohlc(data, max_points)
+    fig = go.Figure()
+
+    # Candlestick chart
+    fig.add_trace(go.Candlestick(
+        x=candles.index,
+        open=candles['Open'],
+        high=candles['High'],
+        low=candles['Low'],
+        close=candles['Close'],
+        name='OHLC'
+    ))
+
+    # Add Bollinger Bands (lean frames share the middle band with SMA_20)
+    if 'BB_upper' in data.columns:
+        middle = data['BB_middle'] if 'BB_middle' in data.columns else data['SMA_20']
+        fig.add_trace(reduced_line_trace(
+            middle, max_points,
+            name='BB Middle', line=dict(color='gray', width=1)
+        ))
+        fig.add_trace(reduced_line_trace(
+            data['BB_upper'], max_points,
+            name='BB Upper', line=dict(color='gray', dash='dash', width=1)
+        ))
+        fig.add_trace(reduced_line_trace(
+            data['BB_lower'], max_points,
+            name='BB Lower', line=dict(color='gray', dash='dash', width=1),
+            fill='tonexty'
+        ))
+
+    # Add Moving Averages
+    for ma in ['SMA_20', 'SMA_50', 'SMA_200']:
+        if ma in data.columns:
+            fig.add_trace(reduced_line_trace(
+                data[ma], max_points,
+                name=ma, line=dict(width=1)
+            ))
+
+    fig.update_layout(
+        title=f'{symbol} Stock Price',
+        yaxis_title='Price',
+        template='plotly_white',
+        height=600,
+        xaxis_rangeslider_visible=False
+    )
+    return fig
+
+def patch_last_candle(fig, bar_time, bar, replace):
+    """Copy of a build_price_chart figure with its last candle moved by a live bar, or the bar appended"""
+    fig = go.Figure(fig)
+    candles = fig.data[0]
+    x = np.asarray(candles.x)
+    open_, high, low, close = (np.array(values, dtype='float64') for values in (
+        candles.open, candles.high, candles.low, candles.close
+    ))
+    if replace:
+        # The last candle may bucket several bars; the live bar is its newest
+        high[-1] = max(high[-1], bar['High'])
+        low[-1] = min(low[-1], bar['Low'])
+        close[-1] = bar['Close']
+    else:
+        x = np.append(x, bar_time)
+        open_, high, low, close = (
+            np.append(values, bar[column])
+            for values, column in ((open_, 'Open'), (high, 'High'), (low, 'Low'), (close, 'Close'))
+        )
+    candles.update(x=x, open=open_, high=high, low=low, close=close)
+    return fig
+
+def build_rsi_chart(data, max_points=CHART_MAX_POINTS):
+    """Relative Strength Index chart with overbought/oversold lines"""
+    fig = go.Figure()
+    fig.add_trace(reduced_line_trace(data['RSI'], max_points, name='RSI'))
+    fig.add_hline(y=70, line_dash="dash", line_color="red")
+    fig.add_hline(y=30, line_dash="dash", line_color="green")
+    fig.update_layout(
+        title='Relative Strength Index (RSI)',
+        yaxis_title='RSI',
+        template='plotly_white',
+        height=300
+    )
+    return fig
+
+def build_macd_chart(data, max_points=CHART_MAX_POINTS):
+    """MACD, signal line and histogram chart"""
+    fig = go.Figure()
+    fig.add_trace(reduced_line_trace(data['MACD'], max_points, name='MACD'))
+    fig.add_trace(reduced_line_trace(data['Signal'], max_points, name='Signal'))
+    hist_x, hist_y = reduce_series(data['MACD_Histogram'], max_points)
+    fig.add_trace(go.Bar(x=hist_x, y=hist_y, name='Histogram'))
+    fig.update_layout(
+        title='MACD',
+        template='plotly_white',
+        height=300
+    )
+    return fig
+
+def figure_stats(fig, started=None):
+    """Point count, serialized payload size and build time of a figure"""
+    stats = {
+        'points': sum(len(trace.x) for trace in fig.data if trace.x is not None),
+        'payload_bytes': len(fig.to_json())
+    }
+    if started is not None:
+        stats['build_ms'] = (time.perf_counter() - started) * 1000
+    return stats
+
+def format_figure_stats(stats):
+    text = f"{stats['points']:,} points, {stats['payload_bytes'] / 1024:,.0f} KB"
+    if 'build_ms' in stats:
+        text += f", built in {stats['build_ms']:.0f} ms"
+    return text
@@ -1,22 +1,217 @@
 import os
+import re
+import threading
+import time
 import psycopg2
+import metrics
+from psycopg2 import pool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, cursor as base_cursor
 from contextlib import contextmanager
 from datetime import datetime
 
-@contextmanager
-def get_db_connection():
-    """Get PostgreSQL database connection"""
-    conn = psycopg2.connect(
+# Connection pool settings
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+# Pooled connections idle for longer than this are checked with SELECT 1
+# before being handed out
+DB_HEALTHCHECK_IDLE = float(os.getenv('DB_HEALTHCHECK_IDLE', '30'))
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = None
+_stats_lock = threading.Lock()
+_pool_stats = {
+    'checkouts': 0,
+    'waits': 0,
+    'wait_time': 0.0,
+    'timeouts': 0,
+    'reconnects': 0
+}
+# Connections of the current pool handed out, and id -> monotonic time
+# each idle pooled connection was returned
+_in_use = 0
+_idle_since = {}
+
+DB_QUERY_SECONDS = metrics.histogram('db_query_seconds', 'SQL statement latency', ['statement'])
+DB_QUERY_ERRORS = metrics.counter('db_query_errors_total', 'Failed SQL statements', ['statement'])
+
+_STATEMENT_VERB = re.compile(r'\s*(\w+)')
+_STATEMENT_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE(?:\s+IF\s+NOT\s+EXISTS)?)\s+([A-Za-z_][\w.]*)', re.I)
+
+def statement_label(query):
+    """Metric label for a statement: its verb and first table, e.g. 'SELECT watchlist'"""
+    if isinstance(query, bytes):
+        query = query.decode(errors='replace')
+    query = str(query)
+    verb = _STATEMENT_VERB.match(query)
+    if verb is None:
+        return 'UNKNOWN'
+    table = _STATEMENT_TABLE.search(query)
+    label = verb.group(1).upper()
+    return f'{label} {table.group(1).lower()}' if table else label
+
+class InstrumentedCursor(base_cursor):
+    """Cursor that records the latency and failures of every statement"""
+
+    def execute(self, query, vars=None):
+        with metrics.timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS, statement=statement_label(query)):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with metrics.timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS, statement=statement_label(query)):
+            return super().executemany(query, vars_list)
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _pool_stats[name] += amount
+
+def _connect_kwargs():
+    return dict(
         dbname=os.getenv('PGDATABASE'),
         user=os.getenv('PGUSER'),
         password=os.getenv('PGPASSWORD'),
         host=os.getenv('PGHOST'),
-        port=os.getenv('PGPORT')
+        port=os.getenv('PGPORT'),
+        cursor_factory=InstrumentedCursor
     )
+
+def connect_db():
+    """Open a dedicated connection outside the pool"""
+    return psycopg2.connect(**_connect_kwargs())
+
+def _current_pool():
+    """The process-wide pool and its slot semaphore, creating them on first use"""
+    global _pool, _pool_slots
+    with _pool_lock:
+        if _pool is None:
+            _pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+            _pool = pool.ThreadedConnectionPool(
+                DB_POOL_MIN, DB_POOL_MAX, **_connect_kwargs()
+            )
+        return _pool, _pool_slots
+
+def get_pool():
+    """Get the process-wide connection pool, creating it on first use"""
+    return _current_pool()[0]
+
+def close_pool():
+    """Close all pooled connections
+
+    Connections still checked out are closed when they are returned.
+    """
+    global _pool, _pool_slots, _in_use
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            with _stats_lock:
+                _pool = None
+                _pool_slots = None
+                _in_use = 0
+                _idle_since.clear()
+
+def get_pool_stats():
+    """Get pool counters and current usage"""
+    with _stats_lock:
+        stats = dict(_pool_stats)
+        stats['in_use'] = _in_use
+        stats['idle'] = len(_idle_since)
+    stats['max_size'] = DB_POOL_MAX
+    return stats
+
+metrics.gauge('db_pool_connections', 'Pooled connections by state', ['state']).set_function(
+    lambda: {(state,): get_pool_stats()[state] for state in ('in_use', 'idle')}
+)
+metrics.counter('db_pool_events_total', 'Connection pool checkouts, waits, timeouts and reconnects', ['event']).set_function(
+    lambda: {(event,): get_pool_stats()[event] for event in ('checkouts', 'waits', 'timeouts', 'reconnects')}
+)
+metrics.counter('db_pool_wait_seconds_total', 'Time spent waiting for a pooled connection').set_function(
+    lambda: get_pool_stats()['wait_time']
+)
+
+def _is_healthy(conn):
+    """Check a pooled connection is still usable before handing it out"""
+    if conn.closed:
+        return False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _checkout(db_pool):
+    global _in_use
+    conn = db_pool.getconn()
+    with _stats_lock:
+        idle_since = _idle_since.pop(id(conn), None)
+    # Connections new to this process or idle for a while may have been
+    # dropped by the server
+    stale = idle_since is None or time.monotonic() - idle_since > DB_HEALTHCHECK_IDLE
+    if conn.closed or (stale and not _is_healthy(conn)):
+        db_pool.putconn(conn, close=True)
+        _count('reconnects')
+        conn = db_pool.getconn()
+        with _stats_lock:
+            _idle_since.pop(id(conn), None)
+    with _stats_lock:
+        if db_pool is _pool:
+            _in_use += 1
+    return conn
+
+def _checkin(db_pool, conn, close):
+    """Return a connection to the pool it came from, or close it if that pool was closed"""
+    global _in_use
+    try:
+        db_pool.putconn(conn, close=close)
+    except pool.PoolError:
+        conn.close()
+    with _stats_lock:
+        if db_pool is _pool:
+            _in_use -= 1
+            if not conn.closed:
+                _idle_since[id(conn)] = time.monotonic()
+
+@contextmanager
+def get_db_connection():
+    """Get PostgreSQL database connection from the shared pool"""
+    # The slot is released to this semaphore even if the pool is closed
+    # and recreated while the connection is out
+    db_pool, slots = _current_pool()
+
+    # Block until a slot is free rather than letting the pool raise
+    if not slots.acquire(blocking=False):
+        _count('waits')
+        started = time.monotonic()
+        acquired = slots.acquire(timeout=DB_POOL_TIMEOUT)
+        _count('wait_time', time.monotonic() - started)
+        if not acquired:
+            _count('timeouts')
+            raise pool.PoolError("Timed out waiting for a database connection")
+
+    try:
+        conn = _checkout(db_pool)
+    except Exception:
+        slots.release()
+        raise
+    _count('checkouts')
+
+    broken = False
     try:
         yield conn
+    except psycopg2.Error:
+        broken = conn.closed != 0
+        raise
     finally:
-        conn.close()
+        # Leave no open transaction behind for the next user
+        if not conn.closed and conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        _checkin(db_pool, conn, broken or bool(conn.closed))
+        slots.release()
 
 def init_db():
     """Initialize the database with required tables"""
@@ -76,16 +271,42 @@ def init_db():
             id SERIAL PRIMARY KEY,
             symbol VARCHAR(10) NOT NULL,
             date TIMESTAMP NOT NULL,
-            open_price DECIMAL(10,2) NOT NULL,
-            high_price DECIMAL(10,2) NOT NULL,
-            low_price DECIMAL(10,2) NOT NULL,
-            close_price DECIMAL(10,2) NOT NULL,
+            open_price DOUBLE PRECISION NOT NULL,
+            high_price DOUBLE PRECISION NOT NULL,
+            low_price DOUBLE PRECISION NOT NULL,
+            close_price DOUBLE PRECISION NOT NULL,
             volume BIGINT NOT NULL,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             UNIQUE(symbol, date)
         )
         ''')
 
+        # Adjusted prices rounded to cents drift from fresh downloads; drop
+        # the rounded cache (it is refetched) and widen the columns
+        cursor.execute('''
+        SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'historical_prices' AND column_name = 'close_price'
+        ''')
+        if cursor.fetchone()[0] == 'numeric':
+            cursor.execute('DELETE FROM historical_prices')
+            cursor.execute('''
+            ALTER TABLE historical_prices
+                ALTER COLUMN open_price TYPE DOUBLE PRECISION,
+                ALTER COLUMN high_price TYPE DOUBLE PRECISION,
+                ALTER COLUMN low_price TYPE DOUBLE PRECISION,
+                ALTER COLUMN close_price TYPE DOUBLE PRECISION
+            ''')
+
+        # Create history_bounds table for the earliest daily bar the data
+        # source has, when that is later than a requested period's start
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS history_bounds (
+            symbol VARCHAR(10) PRIMARY KEY,
+            first_available TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
         # Create real_time_prices table
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS real_time_prices (
@@ -98,4 +319,60 @@ def init_db():
         )
         ''')
 
+        # Create intraday_bars table for bars aggregated from live trades or
+        # backfilled from yfinance; monthly partitions are created on demand
+        # by bar_aggregator
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS intraday_bars (
+            symbol VARCHAR(10) NOT NULL,
+            bar_interval VARCHAR(4) NOT NULL,
+            bar_time TIMESTAMP NOT NULL,
+            open_price DOUBLE PRECISION NOT NULL,
+            high_price DOUBLE PRECISION NOT NULL,
+            low_price DOUBLE PRECISION NOT NULL,
+            close_price DOUBLE PRECISION NOT NULL,
+            volume BIGINT NOT NULL,
+            backfilled BOOLEAN NOT NULL DEFAULT FALSE,
+            PRIMARY KEY (symbol, bar_interval, bar_time)
+        ) PARTITION BY RANGE (bar_time)
+        ''')
+
+        # Create ingest_status table for ingestion daemon heartbeats
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_status (
+            name VARCHAR(50) PRIMARY KEY,
+            hostname TEXT,
+            pid INTEGER,
+            status VARCHAR(20) NOT NULL,
+            started_at TIMESTAMP,
+            heartbeat_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_pass_seconds DOUBLE PRECISION,
+            symbols_tracked INTEGER,
+            quotes_written BIGINT
+        )
+        ''')
+
+        # Create stock_fundamentals table for slow-changing Ticker.info fields
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_fundamentals (
+            symbol VARCHAR(10) PRIMARY KEY,
+            name TEXT,
+            sector TEXT,
+            industry TEXT,
+            description TEXT,
+            market_cap BIGINT,
+            pe_ratio DOUBLE PRECISION,
+            forward_pe DOUBLE PRECISION,
+            dividend_yield DOUBLE PRECISION,
+            beta DOUBLE PRECISION,
+            week52_high DOUBLE PRECISION,
+            week52_low DOUBLE PRECISION,
+            volume BIGINT,
+            avg_volume BIGINT,
+            previous_close DOUBLE PRECISION,
+            last_price DOUBLE PRECISION,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
         conn.commit()
\ No newline at end of file
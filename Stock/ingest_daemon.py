@@ -0,0 +1,183 @@
+"""Market-data ingestion daemon.
+
+Runs the asyncio ingestion engine (batched price polling, the websocket
+feed, bulk price writes and price alert matching) in one process per
+deployment. It writes to the shared database, and the Streamlit UI only
+reads from it.
+
+    python ingest_daemon.py --config ingest.toml
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import tomllib
+from datetime import datetime
+import metrics
+import stock_utils
+from database import connect_db, close_pool, get_db_connection, init_db
+from ingest_engine import IngestEngine
+
+DEFAULT_CONFIG = {
+    'name': 'default',
+    'poll_interval': stock_utils.PRICE_POLL_INTERVAL,
+    'chunk_size': stock_utils.PRICE_POLL_CHUNK_SIZE,
+    'workers': stock_utils.PRICE_POLL_WORKERS,
+    'heartbeat_interval': 10,
+    'websocket': False,
+    'websocket_url': stock_utils.WEBSOCKET_URL,
+    # Prometheus text endpoint; 0 disables it
+    'metrics_port': 9108,
+    'metrics_addr': '127.0.0.1'
+}
+
+PRICE_ROW_AGE = metrics.gauge(
+    'real_time_prices_age_seconds', 'Age of the oldest and newest real_time_prices rows', ['row']
+)
+
+# Postgres advisory lock key held for the lifetime of the daemon
+INGEST_LOCK_KEY = 7319001
+
+def load_config(path=None):
+    """Load the [ingest] table of a TOML config file over the defaults"""
+    config = dict(DEFAULT_CONFIG)
+    if path:
+        with open(path, 'rb') as f:
+            config.update(tomllib.load(f).get('ingest', {}))
+    return config
+
+class IngestDaemon:
+    """Single-instance ingestion loop with a heartbeat record in ingest_status"""
+
+    def __init__(self, config):
+        self.config = config
+        self.name = config['name']
+        self.started_at = None
+        self.engine = IngestEngine(
+            poll_interval=config['poll_interval'],
+            chunk_size=config['chunk_size'],
+            workers=config['workers'],
+            websocket_url=config['websocket_url'] if config['websocket'] else None
+        )
+        self._lock_conn = None
+
+    def acquire_lock(self):
+        """Take the deployment-wide advisory lock; False if another daemon holds it"""
+        self._lock_conn = connect_db()
+        self._lock_conn.autocommit = True
+        with self._lock_conn.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s, hashtext(%s))', (INGEST_LOCK_KEY, self.name))
+            return cursor.fetchone()[0]
+
+    def release_lock(self):
+        if self._lock_conn is not None:
+            # Closing the session releases the advisory lock
+            self._lock_conn.close()
+            self._lock_conn = None
+
+    def write_heartbeat(self, status='running'):
+        """Upsert this daemon's row in ingest_status"""
+        stats = self.engine.stats
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO ingest_status
+                (name, hostname, pid, status, started_at, heartbeat_at,
+                 last_pass_seconds, symbols_tracked, quotes_written)
+                VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP, %s, %s, %s)
+                ON CONFLICT (name)
+                DO UPDATE SET
+                    hostname = EXCLUDED.hostname,
+                    pid = EXCLUDED.pid,
+                    status = EXCLUDED.status,
+                    started_at = EXCLUDED.started_at,
+                    heartbeat_at = CURRENT_TIMESTAMP,
+                    last_pass_seconds = EXCLUDED.last_pass_seconds,
+                    symbols_tracked = EXCLUDED.symbols_tracked,
+                    quotes_written = EXCLUDED.quotes_written
+            ''', (
+                self.name, socket.gethostname(), os.getpid(), status, self.started_at,
+                stats['last_poll_seconds'], stats['symbols_tracked'], stats['rows_written']
+            ))
+            conn.commit()
+
+    def record_price_staleness(self):
+        """Update the real_time_prices age gauge"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT EXTRACT(EPOCH FROM (NOW() - MIN(timestamp))),
+                       EXTRACT(EPOCH FROM (NOW() - MAX(timestamp)))
+                FROM real_time_prices
+            ''')
+            oldest, newest = cursor.fetchone()
+        if oldest is not None:
+            PRICE_ROW_AGE.set(float(oldest), row='oldest')
+            PRICE_ROW_AGE.set(float(newest), row='newest')
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.config['heartbeat_interval'])
+            try:
+                await asyncio.to_thread(self.write_heartbeat)
+                await asyncio.to_thread(self.record_price_staleness)
+            except Exception as e:
+                print(f"Error writing heartbeat: {e}")
+
+    async def _run_engine(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stop)
+
+        heartbeat = asyncio.create_task(self._heartbeat_loop())
+        try:
+            await self.engine.run()
+        finally:
+            heartbeat.cancel()
+
+    def run(self):
+        """Run until stop() is called or a termination signal arrives"""
+        init_db()
+        if not self.acquire_lock():
+            print(f"Ingestion daemon '{self.name}' is already running elsewhere; exiting")
+            self.release_lock()
+            return 1
+
+        self.started_at = datetime.now()
+        print(f"Ingestion daemon '{self.name}' started (pid {os.getpid()})")
+        metrics_server = None
+        if self.config['metrics_port']:
+            metrics_server = metrics.start_http_server(self.config['metrics_port'], self.config['metrics_addr'])
+        try:
+            self.write_heartbeat()
+            asyncio.run(self._run_engine())
+        finally:
+            self.shutdown()
+            if metrics_server is not None:
+                metrics_server.shutdown()
+        return 0
+
+    def stop(self, *args):
+        self.engine.stop()
+
+    def shutdown(self):
+        """Record the stopped state and release the deployment lock"""
+        print(f"Ingestion daemon '{self.name}' shutting down")
+        try:
+            self.write_heartbeat('stopped')
+        except Exception as e:
+            print(f"Error writing final heartbeat: {e}")
+        self.release_lock()
+        close_pool()
+
+def main():
+    parser = argparse.ArgumentParser(description="Market-data ingestion daemon")
+    parser.add_argument('--config', help="Path to a TOML config file with an [ingest] table")
+    args = parser.parse_args()
+
+    daemon = IngestDaemon(load_config(args.config))
+    return daemon.run()
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,352 @@
+import asyncio
+import os
+import sys
+import time
+import metrics
+import stock_utils
+from alert_index import ALERT_CHANNEL, AlertIndex
+from database import connect_db
+from bar_aggregator import BarAggregator, store_intraday_bars
+from ws_manager import WebSocketManager
+
+TICK_QUEUE_SIZE = int(os.getenv('TICK_QUEUE_SIZE', '10000'))
+WRITE_BATCH_SIZE = int(os.getenv('WRITE_BATCH_SIZE', '1000'))
+# Seconds the writer collects ticks after the first one before writing
+QUOTE_FLUSH_INTERVAL = float(os.getenv('QUOTE_FLUSH_INTERVAL', '0.5'))
+ALERT_FLUSH_INTERVAL = float(os.getenv('ALERT_FLUSH_INTERVAL', '1.0'))
+# Seconds between checks for alerts with new ids, and between full reloads
+# that drop deleted alerts and catch missed notifications
+ALERT_REFRESH_INTERVAL = float(os.getenv('ALERT_REFRESH_INTERVAL', '10'))
+ALERT_RELOAD_INTERVAL = float(os.getenv('ALERT_RELOAD_INTERVAL', '300'))
+ALERT_LISTEN_RETRY = float(os.getenv('ALERT_LISTEN_RETRY', '5'))
+BAR_FLUSH_INTERVAL = float(os.getenv('BAR_FLUSH_INTERVAL', '5'))
+# Failed bar writes are retried with exponential backoff up to
+# BAR_RETRY_MAX seconds, keeping at most BAR_RETRY_LIMIT bars
+BAR_RETRY_MAX = float(os.getenv('BAR_RETRY_MAX', '60'))
+BAR_RETRY_LIMIT = int(os.getenv('BAR_RETRY_LIMIT', '100000'))
+
+POLL_SECONDS = metrics.histogram('ingest_poll_seconds', 'Duration of a full price poll pass')
+WRITE_SECONDS = metrics.histogram('ingest_write_seconds', 'Duration of a bulk price write')
+WRITE_LAG_SECONDS = metrics.histogram(
+    'ingest_write_lag_seconds', 'Age of the oldest tick in a batch when the batch is written'
+)
+ALERT_LATENCY_SECONDS = metrics.histogram(
+    'ingest_alert_latency_seconds', 'Time from the feed sending a tick to the alert it triggers'
+)
+BAR_WRITE_SECONDS = metrics.histogram('ingest_bar_write_seconds', 'Duration of a bulk intraday bar write')
+INGEST_ERRORS = metrics.counter('ingest_errors_total', 'Ingestion failures by stage', ['stage'])
+
+class IngestEngine:
+    """Asyncio ingestion engine.
+
+    Polling and the websocket feed produce ticks into bounded queues. A
+    writer task coalesces ticks to the latest per symbol and writes them
+    in one bulk upsert every flush_interval seconds, or sooner once
+    write_batch symbols are waiting. An alert task matches them against
+    the in-memory alert index. Websocket trades are also rolled into
+    intraday bars, which a bar task writes in bulk as they complete. Blocking database and yfinance calls run in the default
+    executor. When the writer falls behind its queue fills up, and
+    producers wait on put(), which pushes backpressure back onto the feeds.
+    """
+
+    def __init__(self, poll_interval=stock_utils.PRICE_POLL_INTERVAL,
+                 chunk_size=stock_utils.PRICE_POLL_CHUNK_SIZE,
+                 workers=stock_utils.PRICE_POLL_WORKERS,
+                 websocket_url=None, queue_size=TICK_QUEUE_SIZE,
+                 write_batch=WRITE_BATCH_SIZE, flush_interval=QUOTE_FLUSH_INTERVAL):
+        self.poll_interval = poll_interval
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.ws_manager = WebSocketManager(websocket_url, self.publish) if websocket_url else None
+        self.write_batch = write_batch
+        self.flush_interval = flush_interval
+        self.write_queue = asyncio.Queue(maxsize=queue_size)
+        self.alert_queue = asyncio.Queue(maxsize=queue_size)
+        # Flushing is done by flush_alerts() off the event loop, never inline
+        self.alert_index = AlertIndex(batch_size=sys.maxsize)
+        self.bar_aggregator = BarAggregator()
+        # Completed bars whose write failed, keyed by (symbol, interval, start)
+        self._unwritten_bars = {}
+        self._bar_backoff = 0.0
+        self._bar_retry_at = 0.0
+        self._stopping = asyncio.Event()
+        self.stats = {
+            'ticks': 0,
+            'rows_written': 0,
+            'coalesced': 0,
+            'write_batches': 0,
+            'last_write_seconds': 0.0,
+            'alerts_triggered': 0,
+            'last_alert_latency_seconds': None,
+            'max_alert_latency_seconds': 0.0,
+            'bars_written': 0,
+            'symbols_tracked': 0,
+            'last_poll_seconds': None,
+            'last_poll_at': None
+        }
+        self._register_metrics()
+
+    def _register_metrics(self):
+        metrics.gauge('ingest_queue_depth', 'Ticks waiting in each queue', ['queue']).set_function(
+            lambda: {(queue,): depth for queue, depth in self.queue_depths().items()}
+        )
+        metrics.counter('ingest_events_total', 'Ticks received, rows written and ticks coalesced', ['event']).set_function(
+            lambda: {
+                (event,): self.stats[event]
+                for event in ('ticks', 'rows_written', 'coalesced', 'alerts_triggered', 'bars_written')
+            }
+        )
+        metrics.gauge('ingest_open_bars', 'Intraday bars still being aggregated').set_function(
+            self.bar_aggregator.open_bars
+        )
+        metrics.gauge('ingest_symbols_tracked', 'Symbols in the polled universe').set_function(
+            lambda: self.stats['symbols_tracked']
+        )
+        metrics.gauge('ingest_last_poll_age_seconds', 'Seconds since the last completed poll pass').set_function(
+            lambda: time.time() - self.stats['last_poll_at'] if self.stats['last_poll_at'] else float('nan')
+        )
+
+    def queue_depths(self):
+        return {
+            'write_queue': self.write_queue.qsize(),
+            'alert_queue': self.alert_queue.qsize()
+        }
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _sleep(self, seconds):
+        """Sleep that returns early on shutdown; True if the engine is stopping"""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=max(seconds, 0))
+        except asyncio.TimeoutError:
+            pass
+        return self._stopping.is_set()
+
+    async def publish(self, symbol, price, volume, sent_at=None, trade=True):
+        """Hand a tick to the writer and alert tasks, waiting if either is full
+
+        Only trades (websocket ticks) are rolled into intraday bars. Polled
+        quotes (trade=False) are a snapshot of the latest 1m bar taken at
+        poll time, so they would make flat, volume-less bars.
+        """
+        tick = (symbol, price, volume, sent_at or time.time())
+        self.stats['ticks'] += 1
+        if trade:
+            self.bar_aggregator.add(symbol, price, volume, tick[3])
+        await self.write_queue.put(tick)
+        await self.alert_queue.put(tick)
+
+    async def poll_prices(self):
+        """Poll the tracked symbol universe in concurrent multi-ticker chunks"""
+        slots = asyncio.Semaphore(self.workers)
+
+        async def fetch(chunk):
+            async with slots:
+                return await asyncio.to_thread(stock_utils.fetch_quote_chunk, chunk)
+
+        while True:
+            started = time.monotonic()
+            try:
+                symbols = sorted(await asyncio.to_thread(stock_utils.get_tracked_symbols))
+                self.stats['symbols_tracked'] = len(symbols)
+                if self.ws_manager is not None:
+                    await self.ws_manager.set_symbols(symbols)
+                # fetch_latest_quotes' chunks, published as each one arrives
+                chunks = stock_utils.quote_chunks(symbols, self.chunk_size)
+                for result in asyncio.as_completed([fetch(chunk) for chunk in chunks]):
+                    try:
+                        quotes = await result
+                    except Exception as e:
+                        INGEST_ERRORS.inc(stage='fetch')
+                        print(f"Error fetching quote chunk: {e}")
+                        continue
+                    for symbol, (price, volume) in quotes.items():
+                        await self.publish(symbol, price, volume, trade=False)
+                self.stats['last_poll_seconds'] = time.monotonic() - started
+                self.stats['last_poll_at'] = time.time()
+                POLL_SECONDS.observe(self.stats['last_poll_seconds'])
+            except Exception as e:
+                INGEST_ERRORS.inc(stage='poll')
+                print(f"Error in price update loop: {e}")
+
+            if await self._sleep(self.poll_interval - (time.monotonic() - started)):
+                return
+
+    async def write_prices(self):
+        """Coalesce queued ticks to the latest per symbol and bulk upsert them
+
+        A batch is written flush_interval seconds after its first tick, or
+        as soon as it holds write_batch symbols.
+        """
+        while True:
+            symbol, price, volume, oldest = await self.write_queue.get()
+            batch = {symbol: (price, volume)}
+            taken = 1
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.write_batch:
+                if self.write_queue.empty():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._stopping.is_set():
+                        break
+                    try:
+                        tick = await asyncio.wait_for(self.write_queue.get(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    tick = self.write_queue.get_nowait()
+                symbol, price, volume, sent_at = tick
+                batch[symbol] = (price, volume)
+                oldest = min(oldest, sent_at)
+                taken += 1
+            try:
+                started = time.monotonic()
+                written = await asyncio.to_thread(stock_utils.store_real_time_prices, batch)
+                self.stats['last_write_seconds'] = time.monotonic() - started
+                self.stats['rows_written'] += written
+                self.stats['coalesced'] += taken - len(batch)
+                self.stats['write_batches'] += 1
+                WRITE_SECONDS.observe(self.stats['last_write_seconds'])
+                WRITE_LAG_SECONDS.observe(time.time() - oldest)
+            except Exception as e:
+                INGEST_ERRORS.inc(stage='write')
+                print(f"Error writing price batch: {e}")
+            finally:
+                for _ in range(taken):
+                    self.write_queue.task_done()
+
+    async def evaluate_alerts(self):
+        """Match ticks against the in-memory alert index"""
+        while True:
+            symbol, price, _, sent_at = await self.alert_queue.get()
+            try:
+                triggered = self.alert_index.match(symbol, price)
+                if triggered:
+                    # Time from the feed sending the tick to the alert firing
+                    latency = time.time() - sent_at
+                    self.stats['alerts_triggered'] += len(triggered)
+                    self.stats['last_alert_latency_seconds'] = latency
+                    self.stats['max_alert_latency_seconds'] = max(self.stats['max_alert_latency_seconds'], latency)
+                    ALERT_LATENCY_SECONDS.observe(latency)
+            except Exception as e:
+                INGEST_ERRORS.inc(stage='alerts')
+                print(f"Error checking price alerts: {e}")
+            finally:
+                self.alert_queue.task_done()
+
+    async def _write_bars(self, final=False):
+        for bar in self.bar_aggregator.drain():
+            self._unwritten_bars[bar[:3]] = bar
+        if not self._unwritten_bars or (not final and time.monotonic() < self._bar_retry_at):
+            return
+        bars = list(self._unwritten_bars.values())
+        started = time.monotonic()
+        written = await asyncio.to_thread(store_intraday_bars, bars)
+        BAR_WRITE_SECONDS.observe(time.monotonic() - started)
+        self.stats['bars_written'] += written
+        if written == len(bars):
+            for bar in bars:
+                del self._unwritten_bars[bar[:3]]
+            self._bar_backoff = 0.0
+            return
+        INGEST_ERRORS.inc(stage='bars')
+        # Keep the batch for the next pass, dropping the oldest bars past the limit
+        dropped = len(self._unwritten_bars) - BAR_RETRY_LIMIT
+        if dropped > 0:
+            for key in list(self._unwritten_bars)[:dropped]:
+                del self._unwritten_bars[key]
+            print(f"Dropped {dropped} unwritten intraday bars")
+        self._bar_backoff = min(max(self._bar_backoff * 2, BAR_FLUSH_INTERVAL), BAR_RETRY_MAX)
+        self._bar_retry_at = time.monotonic() + self._bar_backoff
+        if final:
+            print(f"Lost {len(self._unwritten_bars)} intraday bars on shutdown")
+
+    async def write_bars(self):
+        """Close intraday bars whose time has passed and bulk write completed ones"""
+        while True:
+            await asyncio.sleep(BAR_FLUSH_INTERVAL)
+            self.bar_aggregator.close_due(time.time())
+            await self._write_bars()
+
+    async def flush_alerts(self):
+        """Write triggered alerts and pick up new ones off the event loop"""
+        last_refresh = last_reload = time.monotonic()
+        while True:
+            await asyncio.sleep(ALERT_FLUSH_INTERVAL)
+            await asyncio.to_thread(self.alert_index.flush)
+            now = time.monotonic()
+            if now - last_refresh < ALERT_REFRESH_INTERVAL:
+                continue
+            try:
+                if now - last_reload >= ALERT_RELOAD_INTERVAL:
+                    await asyncio.to_thread(self.alert_index.load)
+                    last_reload = now
+                else:
+                    await asyncio.to_thread(self.alert_index.load_new)
+            except Exception as e:
+                print(f"Error refreshing alert index: {e}")
+            last_refresh = now
+
+    async def listen_alerts(self):
+        """Load alerts announced by set_price_alert as soon as their inserts commit"""
+        loop = asyncio.get_running_loop()
+        while True:
+            conn = None
+            try:
+                conn = await asyncio.to_thread(connect_db)
+                conn.autocommit = True
+                conn.cursor().execute(f'LISTEN {ALERT_CHANNEL}')
+                ready = asyncio.Event()
+                loop.add_reader(conn.fileno(), ready.set)
+                try:
+                    # Catch up on alerts committed before LISTEN took effect
+                    await asyncio.to_thread(self.alert_index.load_new)
+                    while True:
+                        await ready.wait()
+                        ready.clear()
+                        conn.poll()
+                        alert_ids = [int(n.payload) for n in conn.notifies if n.payload.isdigit()]
+                        conn.notifies.clear()
+                        if alert_ids:
+                            await asyncio.to_thread(self.alert_index.load_ids, alert_ids)
+                finally:
+                    loop.remove_reader(conn.fileno())
+            except Exception as e:
+                INGEST_ERRORS.inc(stage='alert_listen')
+                print(f"Error listening for new alerts: {e}")
+            finally:
+                if conn is not None:
+                    conn.close()
+            if await self._sleep(ALERT_LISTEN_RETRY):
+                return
+
+    async def run(self):
+        """Run all tasks until stop() is called, then drain queued writes"""
+        await asyncio.to_thread(self.alert_index.load)
+
+        producers = [asyncio.create_task(self.poll_prices())]
+        if self.ws_manager is not None:
+            producers.append(asyncio.create_task(self.ws_manager.run(self._stopping)))
+        consumers = [
+            asyncio.create_task(self.write_prices()),
+            asyncio.create_task(self.evaluate_alerts()),
+            asyncio.create_task(self.write_bars()),
+            asyncio.create_task(self.flush_alerts()),
+            asyncio.create_task(self.listen_alerts())
+        ]
+
+        await self._stopping.wait()
+        for task in producers:
+            task.cancel()
+        await asyncio.gather(*producers, return_exceptions=True)
+
+        # Let consumers finish what was already queued
+        await self.write_queue.join()
+        await self.alert_queue.join()
+        for task in consumers:
+            task.cancel()
+        await asyncio.gather(*consumers, return_exceptions=True)
+        await asyncio.to_thread(self.alert_index.flush)
+        # Write the bars still in progress rather than lose them
+        self.bar_aggregator.close_all()
+        await self._write_bars(final=True)
@@ -1,27 +1,77 @@
 import streamlit as st
 import plotly.graph_objects as go
 from datetime import datetime
-import pandas as pd
+import os
 import time
+import metrics
 from database import init_db
 from auth import init_session_state, login_user, register_user
+from chart_utils import (
+    build_price_chart, build_rsi_chart, build_macd_chart, patch_last_candle,
+    figure_stats, format_figure_stats
+)
 from stock_utils import (
-    get_stock_data, get_stock_info, add_to_watchlist,
+    get_stock_data, get_stock_info, get_stock_infos, get_real_time_price, add_to_watchlist,
     get_watchlist, add_to_portfolio, get_portfolio,
-    calculate_portfolio_metrics, start_price_updates, calculate_volume_profile,
-    set_price_alert, get_price_alerts, render_technical_indicators, is_valid_stock_symbol
+    calculate_portfolio_metrics, get_ingest_status, calculate_volume_profile, calculate_value_area,
+    set_price_alert, get_price_alerts, render_technical_indicators, is_valid_stock_symbol,
+    format_portfolio_table, frame_memory_usage, apply_quote, live_candle, INTRADAY_INTERVAL_PERIODS
 )
+from screener import build_snapshot, screen
+
+# Live sections rerun on their own timer; everything else only reruns on input changes
+LIVE_REFRESH_SECONDS = 5
+HISTORY_CACHE_SECONDS = 60
+# Serve this process's metrics (reruns, queries, caches) when set
+UI_METRICS_PORT = int(os.getenv('UI_METRICS_PORT', '0'))
+# Show chart point counts, payload sizes and frame memory under the price chart
+CHART_DEBUG = os.getenv('CHART_DEBUG', '').lower() in ('1', 'true', 'yes')
+
+RERUN_SECONDS = metrics.histogram('streamlit_rerun_seconds', 'Duration of a full Streamlit script run')
+
+@st.cache_resource
+def init_app():
+    """One-time setup shared by every session in this process
+
+    Prices are written by the separate ingestion daemon (ingest_daemon.py);
+    the UI only reads them.
+    """
+    init_db()
+    if UI_METRICS_PORT:
+        metrics.start_http_server(UI_METRICS_PORT)
+
+@st.cache_data
+def load_css():
+    with open('styles.css') as f:
+        return f.read()
+
+@st.cache_data(ttl=HISTORY_CACHE_SECONDS, show_spinner=False)
+def load_stock_data(symbol, period, interval='1d'):
+    return get_stock_data(symbol, period=period, interval=interval)
+
+@st.cache_data(ttl=HISTORY_CACHE_SECONDS, show_spinner=False)
+def load_screen_snapshot(symbols):
+    """Latest indicator values for a universe (None means every cached symbol)"""
+    return build_snapshot(list(symbols) if symbols else None)
+
+def price_markdown(info):
+    """Price line with the percent change, or N/A when no price is known"""
+    if info.get('price') is None:
+        return "**Price:** N/A"
+    price_color = "positive-change" if info['change'] > 0 else "negative-change"
+    return f"**Price:** ${info['price']:.2f} <span class='{price_color}'>({info['change']:.2f}%)</span>"
+
+def live_fragment(func):
+    """Wrap a render function so it refreshes by itself while auto-refresh is on"""
+    run_every = LIVE_REFRESH_SECONDS if st.session_state.auto_refresh else None
+    return st.fragment(func, run_every=run_every)
 
 # Initialize database and session state
-init_db()
+init_app()
 init_session_state()
 
-# Start background price updates
-start_price_updates()
-
 # Apply custom CSS
-with open('styles.css') as f:
-    st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+st.markdown(f'<style>{load_css()}</style>', unsafe_allow_html=True)
 
 # Add auto-refresh to session state
 if 'auto_refresh' not in st.session_state:
@@ -87,53 +137,25 @@ def render_login_page():
         Your trusted companion for stock market analysis and portfolio management.
         """)
 
-def render_stock_chart(symbol, data):
+def render_live_price_chart(symbol, fig, data, interval):
+    """Render the prebuilt price chart with its last candle moved by the latest quote"""
+    rt_data = get_real_time_price(symbol)
+    candle = live_candle(data, rt_data, interval) if rt_data else None
+    if candle is not None:
+        fig = patch_last_candle(fig, *candle, replace=candle[0] == data.index[-1])
+    st.plotly_chart(fig, use_container_width=True)
+
+def render_stock_chart(symbol, data, interval='1d'):
     if data is not None:
-        # Create main chart with candlesticks and indicators
-        fig = go.Figure()
-
-        # Candlestick chart
-        fig.add_trace(go.Candlestick(
-            x=data.index,
-            open=data['Open'],
-            high=data['High'],
-            low=data['Low'],
-            close=data['Close'],
-            name='OHLC'
-        ))
-
-        # Add Bollinger Bands
-        if 'BB_middle' in data.columns:
-            fig.add_trace(go.Scatter(
-                x=data.index, y=data['BB_middle'],
-                name='BB Middle', line=dict(color='gray', width=1)
-            ))
-            fig.add_trace(go.Scatter(
-                x=data.index, y=data['BB_upper'],
-                name='BB Upper', line=dict(color='gray', dash='dash', width=1)
-            ))
-            fig.add_trace(go.Scatter(
-                x=data.index, y=data['BB_lower'],
-                name='BB Lower', line=dict(color='gray', dash='dash', width=1),
-                fill='tonexty'
-            ))
-
-        # Add Moving Averages
-        for ma in ['SMA_20', 'SMA_50', 'SMA_200']:
-            if ma in data.columns:
-                fig.add_trace(go.Scatter(
-                    x=data.index, y=data[ma],
-                    name=ma, line=dict(width=1)
-                ))
-
-        fig.update_layout(
-            title=f'{symbol} Stock Price',
-            yaxis_title='Price',
-            template='plotly_white',
-            height=600,
-            xaxis_rangeslider_visible=False
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        # Create main chart with candlesticks and indicators; only its last
+        # candle follows live quotes between data reloads
+        started = time.perf_counter()
+        fig = build_price_chart(symbol, data)
+        live_fragment(render_live_price_chart)(symbol, fig, data, interval)
+        if CHART_DEBUG:
+            # figure_stats serializes the whole figure
+            frame_kb = frame_memory_usage(data)['total_bytes'] / 1024
+            st.caption(f"{format_figure_stats(figure_stats(fig, started))}; frame uses {frame_kb:,.0f} KB")
 
         # Technical Indicators in separate charts
         col1, col2 = st.columns(2)
@@ -141,43 +163,12 @@ def render_stock_chart(symbol, data):
         with col1:
             # RSI Chart
             if 'RSI' in data.columns:
-                fig_rsi = go.Figure()
-                fig_rsi.add_trace(go.Scatter(
-                    x=data.index, y=data['RSI'],
-                    name='RSI'
-                ))
-                fig_rsi.add_hline(y=70, line_dash="dash", line_color="red")
-                fig_rsi.add_hline(y=30, line_dash="dash", line_color="green")
-                fig_rsi.update_layout(
-                    title='Relative Strength Index (RSI)',
-                    yaxis_title='RSI',
-                    template='plotly_white',
-                    height=300
-                )
-                st.plotly_chart(fig_rsi, use_container_width=True)
+                st.plotly_chart(build_rsi_chart(data), use_container_width=True)
 
         with col2:
             # MACD Chart
             if all(x in data.columns for x in ['MACD', 'Signal', 'MACD_Histogram']):
-                fig_macd = go.Figure()
-                fig_macd.add_trace(go.Scatter(
-                    x=data.index, y=data['MACD'],
-                    name='MACD'
-                ))
-                fig_macd.add_trace(go.Scatter(
-                    x=data.index, y=data['Signal'],
-                    name='Signal'
-                ))
-                fig_macd.add_trace(go.Bar(
-                    x=data.index, y=data['MACD_Histogram'],
-                    name='Histogram'
-                ))
-                fig_macd.update_layout(
-                    title='MACD',
-                    template='plotly_white',
-                    height=300
-                )
-                st.plotly_chart(fig_macd, use_container_width=True)
+                st.plotly_chart(build_macd_chart(data), use_container_width=True)
 
 def render_stock_details(symbol, info):
     """Render detailed stock information with error handling"""
@@ -191,8 +182,7 @@ def render_stock_details(symbol, info):
         st.markdown(f"### {info['name']} ({symbol})")
         st.markdown(f"**Sector:** {info.get('sector', 'N/A')}")
         st.markdown(f"**Industry:** {info.get('industry', 'N/A')}")
-        price_color = "positive-change" if info.get('change', 0) > 0 else "negative-change"
-        st.markdown(f"**Price:** ${info.get('price', 0):.2f} <span class='{price_color}'>({info.get('change', 0):.2f}%)</span>", unsafe_allow_html=True)
+        live_fragment(render_live_quote)(symbol, info)
 
     with col2:
         st.markdown(f"**P/E Ratio:** {info.get('pe_ratio', 'N/A')}")
@@ -209,17 +199,39 @@ def render_stock_details(symbol, info):
     with st.expander("Company Description"):
         st.write(info.get('description', 'No description available'))
 
+def render_live_quote(symbol, info):
+    """Render the live price, change and time of the last quote"""
+    info = apply_quote(info, get_real_time_price(symbol))
+    st.markdown(price_markdown(info), unsafe_allow_html=True)
+    if info['quote_time'] is not None:
+        st.caption(f"Last update: {info['quote_time']:%H:%M:%S}")
+
 def render_volume_profile(data):
     """Render volume profile analysis"""
-    price_bins, volume_profile = calculate_volume_profile(data)
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        bins = st.slider("Price Bins", min_value=10, max_value=200, value=50, step=10)
+    with col2:
+        weight_by_range = st.checkbox("Spread over High-Low", value=True)
+
+    price_bins, volume_profile = calculate_volume_profile(
+        data, bins=bins, weight_by_range=weight_by_range
+    )
+    value_area = calculate_value_area(price_bins, volume_profile)
 
     fig = go.Figure()
     fig.add_trace(go.Bar(
         x=volume_profile,
-        y=price_bins[:-1],
+        y=(price_bins[:-1] + price_bins[1:]) / 2,
         orientation='h',
         name='Volume Profile'
     ))
+    fig.add_hline(y=value_area['poc'], line_color="red", annotation_text="POC")
+    fig.add_hrect(
+        y0=value_area['value_area_low'], y1=value_area['value_area_high'],
+        fillcolor="gray", opacity=0.15, line_width=0,
+        annotation_text="Value Area"
+    )
 
     fig.update_layout(
         title='Volume Profile Analysis',
@@ -248,6 +260,10 @@ def render_price_alerts(symbol):
             st.error("Failed to set price alert")
 
     # Display existing alerts
+    live_fragment(render_alert_status)(symbol)
+
+def render_alert_status(symbol):
+    """Render the status of the user's alerts for a symbol"""
     alerts = get_price_alerts(st.session_state.user_id, symbol)
     if alerts:
         st.write("Active Alerts:")
@@ -263,10 +279,10 @@ def render_portfolio_performance(portfolio_data):
     portfolio_items, summary = calculate_portfolio_metrics(portfolio_data)
 
     # Portfolio Composition Pie Chart
-    portfolio_df = pd.DataFrame(portfolio_items)
+    composition = portfolio_items.groupby('Symbol', sort=False)['Total Value'].sum()
     fig_composition = go.Figure(data=[go.Pie(
-        labels=portfolio_df['Symbol'],
-        values=portfolio_df['Total Value'].str.replace('$', '').str.replace(',', '').astype(float),
+        labels=composition.index,
+        values=composition.values,
         hole=.3
     )])
     fig_composition.update_layout(title='Portfolio Composition')
@@ -291,19 +307,99 @@ def render_portfolio_performance(portfolio_data):
             len(portfolio_items)
         )
 
+    st.dataframe(
+        format_portfolio_table(portfolio_items),
+        hide_index=True,
+        use_container_width=True
+    )
+
+
+def render_watchlist(watchlist):
+    """Render live quotes for every watchlist symbol"""
+    infos = get_stock_infos(watchlist)
+    cols = st.columns(2)
+    for idx, symbol in enumerate(watchlist):
+        with cols[idx % 2]:
+            info = infos.get(symbol)
+            if info:
+                with st.container():
+                    st.markdown(f"### {info['name']} ({symbol})")
+                    st.markdown(price_markdown(info), unsafe_allow_html=True)
+                    st.markdown(f"**Volume:** {info['volume']:,}")
+
+def render_feed_status():
+    """Render the ingestion daemon heartbeat"""
+    status = get_ingest_status()
+    if not status:
+        st.caption("Market data feed: not running")
+    elif status['status'] != 'running' or status['heartbeat_age'] > 120:
+        st.caption(f"Market data feed: {status['status']}, last seen {status['heartbeat_age']:.0f}s ago")
+    else:
+        st.caption(f"Market data feed: live ({status['symbols_tracked'] or 0} symbols)")
+
+def render_screener():
+    """Filter and rank a universe on its latest indicator values"""
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        expression = st.text_input(
+            "Filter", placeholder="RSI < 30 and Close > SMA_200",
+            help="Columns: Close, High, Low, Volume, RSI, SMA_20, SMA_50, SMA_200, EMA_12, EMA_26, "
+                 "MACD, Signal, MACD_Histogram, BB_middle, BB_upper, BB_lower, Stoch_K, Stoch_D"
+        )
+    with col2:
+        universe = st.selectbox("Universe", ["All cached symbols", "Watchlist"])
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        rank_by = st.text_input("Rank by", placeholder="MACD_Histogram")
+    with col2:
+        ascending = st.toggle("Ascending", value=False)
+    with col3:
+        top = st.number_input("Top N (0 for all)", min_value=0, value=0, step=10)
+    with col4:
+        page_size = st.selectbox("Rows per page", [25, 50, 100], index=1)
+
+    symbols = None
+    if universe == "Watchlist":
+        symbols = tuple(sorted(get_watchlist(st.session_state.user_id)))
+        if not symbols:
+            st.info("Your watchlist is empty")
+            return
+
+    with st.spinner('Computing indicators...'):
+        snapshot = load_screen_snapshot(symbols)
+    if snapshot.empty:
+        st.info("No cached price history for this universe yet")
+        return
+
+    try:
+        results = screen(snapshot, expression or None, rank_by or None, ascending, top or None)
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    pages = max(1, -(-len(results) // page_size))
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1)
+    st.caption(f"{len(results):,} of {len(snapshot):,} symbols match, page {page} of {pages}")
+    st.dataframe(
+        results.iloc[(page - 1) * page_size:page * page_size].round(2),
+        use_container_width=True
+    )
 
 def render_main_page():
     st.title(f"Welcome to StockSentinel, {st.session_state.username}!")
 
     # Auto-refresh toggle
     st.sidebar.toggle("Auto-refresh data", key="auto_refresh")
+    with st.sidebar:
+        live_fragment(render_feed_status)()
 
     # Sidebar navigation
-    page = st.sidebar.radio("Navigation", ["Search", "Watchlist", "Portfolio"])
+    page = st.sidebar.radio("Navigation", ["Search", "Watchlist", "Portfolio", "Screener"])
 
     if page == "Search":
         st.subheader("Search Stocks")
-        col1, col2 = st.columns([3, 1])
+        col1, col2, col3 = st.columns([3, 1, 1])
 
         with col1:
             symbol = st.text_input("Enter Stock Symbol (e.g., AAPL)").upper()
@@ -311,12 +407,18 @@ def render_main_page():
                 st.error("Invalid stock symbol format. Please enter a valid symbol (e.g., AAPL, MSFT)")
                 return
 
+        with col3:
+            interval = st.selectbox("Interval", ['1d', '15m', '5m', '1m'])
+
         with col2:
-            period = st.selectbox(
-                "Time Period",
-                ['1mo', '3mo', '6mo', '1y', '2y', '5y'],
-                index=3
-            )
+            if interval == '1d':
+                period = st.selectbox(
+                    "Time Period",
+                    ['1mo', '3mo', '6mo', '1y', '2y', '5y'],
+                    index=3
+                )
+            else:
+                period = st.selectbox("Time Period", INTRADAY_INTERVAL_PERIODS[interval])
 
         if symbol and is_valid_stock_symbol(symbol):
             with st.spinner('Fetching stock data...'):
@@ -329,7 +431,7 @@ def render_main_page():
                     render_price_alerts(symbol)
 
                     # Charts
-                    data, error_msg = get_stock_data(symbol, period=period)
+                    data, error_msg = load_stock_data(symbol, period, interval)
                     if error_msg:
                         st.error(error_msg)
                     elif data is not None:
@@ -340,14 +442,14 @@ def render_main_page():
                         ])
 
                         with tab1:
-                            render_stock_chart(symbol, data)
+                            render_stock_chart(symbol, data, interval)
 
                         with tab2:
                             render_volume_profile(data)
 
                         with tab3:
                             st.plotly_chart(
-                                render_technical_indicators(data),
+                                render_technical_indicators(data, symbol, f"{period}/{interval}"),
                                 use_container_width=True
                             )
 
@@ -363,7 +465,9 @@ def render_main_page():
                     with col2:
                         shares = st.number_input("Shares", min_value=0.01, step=0.01)
                         if st.button("Add to Portfolio"):
-                            if add_to_portfolio(
+                            if info['price'] is None:
+                                st.error(f"No price available for {symbol}")
+                            elif add_to_portfolio(
                                 st.session_state.user_id,
                                 symbol,
                                 shares,
@@ -380,16 +484,7 @@ def render_main_page():
         watchlist = get_watchlist(st.session_state.user_id)
 
         if watchlist:
-            cols = st.columns(2)
-            for idx, symbol in enumerate(watchlist):
-                with cols[idx % 2]:
-                    info = get_stock_info(symbol)
-                    if info:
-                        with st.container():
-                            st.markdown(f"### {info['name']} ({symbol})")
-                            price_color = "positive-change" if info['change'] > 0 else "negative-change"
-                            st.markdown(f"**Price:** ${info['price']:.2f} <span class='{price_color}'>({info['change']:.2f}%)</span>", unsafe_allow_html=True)
-                            st.markdown(f"**Volume:** {info['volume']:,}")
+            live_fragment(render_watchlist)(watchlist)
         else:
             st.info("Your watchlist is empty")
 
@@ -398,10 +493,14 @@ def render_main_page():
         portfolio = get_portfolio(st.session_state.user_id)
 
         if portfolio:
-            render_portfolio_performance(portfolio)
+            live_fragment(render_portfolio_performance)(portfolio)
         else:
             st.info("Your portfolio is empty")
 
+    elif page == "Screener":
+        st.subheader("Stock Screener")
+        render_screener()
+
     if st.sidebar.button("Logout"):
         st.session_state.logged_in = False
         st.session_state.user_id = None
@@ -412,11 +511,9 @@ def main():
     if not st.session_state.logged_in:
         render_login_page()
     else:
+        # Live sections refresh themselves every LIVE_REFRESH_SECONDS when enabled
         render_main_page()
-        # Auto-refresh every 5 seconds if enabled
-        if st.session_state.auto_refresh:
-            time.sleep(5)
-            st.rerun()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with RERUN_SECONDS.time():
+        main()
\ No newline at end of file
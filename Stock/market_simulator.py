@@ -0,0 +1,500 @@
+"""Local market-data simulator for offline load testing.
+
+Generates random-walk quotes for a synthetic symbol universe, or replays
+a recorded websocket feed (JSON lines) or OHLCV CSV files at 1x-1000x
+speed. Quotes are served over a local websocket that speaks the same
+subscribe/unsubscribe protocol as the live feed, and each quote carries
+its send time in 't' so the ingestion engine can measure tick-to-alert
+latency.
+
+    python market_simulator.py random --symbols 500 --rate 2000
+    python market_simulator.py check
+    python market_simulator.py replay feed.jsonl --speed 100
+    python market_simulator.py replay AAPL.csv MSFT.csv --speed 1000
+    python market_simulator.py record ws://localhost:8765 AAPL MSFT -o feed.jsonl
+
+Set websocket_url = "ws://localhost:8765" in ingest.toml to point the
+daemon at it. SimulatedYFinance stands in for the yfinance module; set
+MARKET_SIMULATOR=1 (and optionally MARKET_SIMULATOR_BARS to a CSV file)
+to have stock_utils use it.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import string
+import time
+import zlib
+import numpy as np
+import pandas as pd
+import websockets
+
+SIMULATOR_PORT = int(os.getenv('SIMULATOR_PORT', '8765'))
+MARKET_TZ = 'America/New_York'
+# Synthetic daily history starts here for every symbol
+HISTORY_EPOCH = pd.Timestamp('2000-01-03')
+DAILY_VOLATILITY = 0.02
+SESSION_MINUTES = 390
+
+INTRADAY_RULES = {
+    '1m': '1min', '2m': '2min', '5m': '5min', '15m': '15min',
+    '30m': '30min', '60m': '60min', '90m': '90min', '1h': '60min'
+}
+LONG_RULES = {'1wk': 'W-FRI', '1mo': 'MS', '3mo': 'QS'}
+PERIOD_OFFSETS = {
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10)
+}
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+def symbol_universe(count):
+    """Synthetic ticker names SAAAA, SAAAB, ...
+
+    Letters only, so they pass stock_utils.is_valid_stock_symbol.
+    """
+    if count > 26 ** 4:
+        raise ValueError(f"At most {26 ** 4} synthetic symbols are available")
+    return [
+        'S' + ''.join(letters)
+        for letters in itertools.islice(itertools.product(string.ascii_uppercase, repeat=4), count)
+    ]
+
+def _seed(*parts):
+    return zlib.crc32('|'.join(str(part) for part in parts).encode())
+
+def random_walk_bars(rng, start_price, n, sigma):
+    """n geometric random-walk OHLCV bars starting at start_price"""
+    closes = start_price * np.exp(np.cumsum(rng.normal(-sigma ** 2 / 2, sigma, n)))
+    opens = np.empty(n)
+    opens[0] = start_price
+    opens[1:] = closes[:-1]
+    wick = np.abs(rng.normal(0, sigma / 2, (2, n)))
+    return {
+        'Open': opens,
+        'High': np.maximum(opens, closes) * (1 + wick[0]),
+        'Low': np.minimum(opens, closes) * (1 - wick[1]),
+        'Close': closes,
+        'Volume': rng.lognormal(13, 0.5, n).astype('int64')
+    }
+
+def load_bars(paths):
+    """Load OHLCV CSV files as {symbol: DataFrame}
+
+    Each file needs a Date or Datetime column and OHLCV columns. A Symbol
+    column splits a file into several symbols; otherwise the file name
+    (without extension) is the symbol.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    bars = {}
+    for path in paths:
+        frame = pd.read_csv(path)
+        time_column = 'Datetime' if 'Datetime' in frame.columns else 'Date'
+        frame.index = pd.DatetimeIndex(pd.to_datetime(frame.pop(time_column)), name='Date')
+        if 'Symbol' in frame.columns:
+            for symbol, rows in frame.groupby('Symbol'):
+                bars[str(symbol).upper()] = rows[OHLCV_COLUMNS].sort_index()
+        else:
+            symbol = os.path.splitext(os.path.basename(path))[0].upper()
+            bars[symbol] = frame[OHLCV_COLUMNS].sort_index()
+    return bars
+
+class SimTicker:
+    """Stand-in for yfinance.Ticker backed by seeded random walks or replayed bars"""
+
+    def __init__(self, symbol, source):
+        self.ticker = symbol
+        self._source = source
+
+    @property
+    def info(self):
+        price = float(self._source.daily(self.ticker)['Close'].iloc[-1])
+        return {
+            'longName': f'{self.ticker} Simulated Inc.',
+            'sector': 'Simulated',
+            'industry': 'Simulated',
+            'longBusinessSummary': 'Synthetic instrument generated by market_simulator.',
+            'marketCap': int(price * 1e8),
+            'currentPrice': price,
+            'previousClose': price
+        }
+
+    def history(self, period='1mo', interval='1d', start=None, end=None, **kwargs):
+        if interval in INTRADAY_RULES:
+            return self._source.intraday(self.ticker, period, interval)
+
+        bars = self._source.daily(self.ticker)
+        if start is not None:
+            bars = bars[bars.index >= pd.Timestamp(start).tz_localize(MARKET_TZ)]
+        elif period in PERIOD_OFFSETS:
+            bars = bars[bars.index >= bars.index[-1] - PERIOD_OFFSETS[period]]
+        elif period == 'ytd':
+            bars = bars[bars.index.year == bars.index[-1].year]
+        elif period.endswith('d') and period[:-1].isdigit():
+            bars = bars.iloc[-int(period[:-1]):]
+        if end is not None:
+            bars = bars[bars.index < pd.Timestamp(end).tz_localize(MARKET_TZ)]
+        if interval in LONG_RULES:
+            bars = _resample(bars, LONG_RULES[interval])
+        return bars.copy()
+
+class SimulatedYFinance:
+    """Drop-in for the parts of the yfinance module this app uses
+
+    Symbols present in the replayed bars are served from them; any other
+    symbol gets a random walk seeded by its name, so repeated calls agree.
+    """
+
+    def __init__(self, bars=None):
+        self.bars = load_bars(bars) if bars else {}
+        self._daily = {}
+
+    def Ticker(self, symbol):
+        return SimTicker(symbol, self)
+
+    def daily(self, symbol):
+        if symbol not in self._daily:
+            if symbol in self.bars:
+                bars = self.bars[symbol].copy()
+            else:
+                rng = np.random.default_rng(_seed(symbol))
+                dates = pd.bdate_range(HISTORY_EPOCH, pd.Timestamp.now().normalize())
+                bars = pd.DataFrame(
+                    random_walk_bars(rng, rng.uniform(10, 500), len(dates), DAILY_VOLATILITY),
+                    index=dates
+                )
+            if bars.index.tz is None:
+                bars.index = bars.index.tz_localize(MARKET_TZ)
+            bars.index.name = 'Date'
+            self._daily[symbol] = bars
+        return self._daily[symbol]
+
+    def intraday(self, symbol, period='1d', interval='1m'):
+        """Minute bars for the last sessions, resampled to the interval"""
+        sessions = int(period[:-1]) if period.endswith('d') and period[:-1].isdigit() else 1
+        daily = self.daily(symbol)
+        now = pd.Timestamp.now(tz=MARKET_TZ)
+        frames = []
+        for day, row in daily.iloc[-sessions - 1:].iterrows():
+            rng = np.random.default_rng(_seed(symbol, day.date()))
+            minutes = day + pd.Timedelta(hours=9, minutes=30) + pd.to_timedelta(np.arange(SESSION_MINUTES), unit='min')
+            bars = pd.DataFrame(
+                random_walk_bars(rng, row['Open'], SESSION_MINUTES, DAILY_VOLATILITY / np.sqrt(SESSION_MINUTES)),
+                index=minutes
+            )
+            bars['Volume'] //= SESSION_MINUTES
+            bars = bars[bars.index <= now]
+            if len(bars):
+                frames.append(bars)
+        frame = pd.concat(frames[-sessions:]) if frames else pd.DataFrame(columns=OHLCV_COLUMNS)
+        frame.index.name = 'Datetime'
+        if interval != '1m' and len(frame):
+            frame = _resample(frame, INTRADAY_RULES[interval])
+        return frame
+
+    def download(self, tickers, period='1mo', interval='1d', group_by='column', **kwargs):
+        if isinstance(tickers, str):
+            tickers = tickers.replace(',', ' ').split()
+        frames = {symbol: self.Ticker(symbol).history(period=period, interval=interval) for symbol in tickers}
+        data = pd.concat(frames, axis=1)
+        if group_by != 'ticker':
+            data = data.swaplevel(axis=1).sort_index(axis=1)
+        return data
+
+def _resample(bars, rule):
+    resampled = bars.resample(rule).agg({
+        'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'
+    })
+    return resampled.dropna(subset=['Close'])
+
+class RandomWalkFeed:
+    """Endless stream of random-walk quotes at roughly rate quotes per second
+
+    Iterating yields (offset seconds, quotes) batches, like the replay
+    feeds. Prices start from each symbol's last simulated daily close.
+    """
+
+    def __init__(self, symbols, rate=1000, sigma=0.0005, batch_interval=0.05, seed=None):
+        self.symbols = list(symbols)
+        self.rate = rate
+        self.sigma = sigma
+        self.batch_interval = batch_interval
+        self.rng = np.random.default_rng(seed)
+        source = SimulatedYFinance()
+        self.prices = np.array([source.daily(symbol)['Close'].iloc[-1] for symbol in self.symbols])
+
+    def __iter__(self):
+        per_batch = max(1, int(round(self.rate * self.batch_interval)))
+        offset = 0.0
+        while True:
+            picks = self.rng.integers(0, len(self.symbols), per_batch)
+            self.prices[picks] *= np.exp(self.rng.normal(0, self.sigma, per_batch))
+            volumes = self.rng.integers(1, 1000, per_batch)
+            yield offset, [
+                {'s': self.symbols[i], 'p': round(float(self.prices[i]), 4), 'v': int(v)}
+                for i, v in zip(picks, volumes)
+            ]
+            offset += self.batch_interval
+
+def recording_feed(path):
+    """Replay a JSON-lines recording made by the record command
+
+    Each line is a feed message with a receive time in 't'. Lines without
+    one are replayed immediately after the previous line.
+    """
+    start = None
+    offset = 0.0
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            message = json.loads(line)
+            if 't' in message:
+                start = message['t'] if start is None else start
+                offset = message['t'] - start
+            quotes = [
+                {key: value for key, value in quote.items() if key != 't'}
+                for quote in message.get('data', [])
+            ]
+            yield offset, quotes
+
+def bars_feed(paths):
+    """Replay OHLCV CSV files as one close-price quote per bar"""
+    frames = []
+    for symbol, bars in load_bars(paths).items():
+        frames.append(pd.DataFrame({'s': symbol, 'p': bars['Close'], 'v': bars['Volume']}))
+    if not frames:
+        return
+    quotes = pd.concat(frames).sort_index(kind='stable')
+    start = quotes.index[0]
+    for timestamp, rows in quotes.groupby(level=0, sort=False):
+        yield (timestamp - start).total_seconds(), [
+            {'s': s, 'p': float(p), 'v': int(v)}
+            for s, p, v in zip(rows['s'], rows['p'], rows['v'])
+        ]
+
+def replay_feed(paths):
+    """Pick the replay format from the file extension"""
+    if len(paths) == 1 and paths[0].endswith(('.jsonl', '.json')):
+        return recording_feed(paths[0])
+    return bars_feed(paths)
+
+class MarketSimulator:
+    """Serve a feed over a local websocket
+
+    Clients send {"type": "subscribe"|"unsubscribe", "symbols": [...]}
+    and receive {"data": [{"s", "p", "v", "t"}, ...]} messages holding
+    only the quotes they subscribed to ("*" subscribes to everything).
+    The feed starts when the first client connects, and its offsets are
+    divided by speed.
+    """
+
+    def __init__(self, feed, host='127.0.0.1', port=SIMULATOR_PORT, speed=1.0):
+        self.feed = feed
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.clients = {}
+        self._connected = asyncio.Event()
+        self.stats = {'messages_sent': 0, 'quotes_sent': 0, 'batches': 0, 'max_lag_seconds': 0.0}
+
+    async def _handler(self, ws):
+        subscriptions = self.clients[ws] = set()
+        self._connected.set()
+        try:
+            async for message in ws:
+                try:
+                    request = json.loads(message)
+                except ValueError:
+                    continue
+                symbols = set(request.get('symbols', []))
+                if request.get('type') == 'subscribe':
+                    subscriptions |= symbols
+                elif request.get('type') == 'unsubscribe':
+                    subscriptions -= symbols
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            del self.clients[ws]
+
+    async def publish(self, quotes):
+        """Send each client the quotes it is subscribed to, stamped with the send time"""
+        for ws, subscriptions in list(self.clients.items()):
+            if '*' in subscriptions:
+                selected = quotes
+            else:
+                selected = [quote for quote in quotes if quote['s'] in subscriptions]
+            if not selected:
+                continue
+            sent_at = time.time()
+            try:
+                await ws.send(json.dumps({'data': [dict(quote, t=sent_at) for quote in selected]}))
+            except websockets.ConnectionClosed:
+                continue
+            self.stats['messages_sent'] += 1
+            self.stats['quotes_sent'] += len(selected)
+
+    async def stream(self):
+        """Pace the feed in wall-clock time until it runs out"""
+        await self._connected.wait()
+        started = time.monotonic()
+        for offset, quotes in self.feed:
+            delay = started + offset / self.speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.stats['max_lag_seconds'] = max(self.stats['max_lag_seconds'], -delay)
+                # Yield to the client handlers even when behind schedule
+                await asyncio.sleep(0)
+            await self.publish(quotes)
+            self.stats['batches'] += 1
+
+    async def run(self):
+        async with websockets.serve(self._handler, self.host, self.port):
+            print(f"Market simulator listening on ws://{self.host}:{self.port}")
+            await self.stream()
+            print(f"Feed finished: {self.stats}")
+
+async def record(url, symbols, path, seconds=None):
+    """Record a feed to JSON lines for later replay"""
+    stopping = time.monotonic() + seconds if seconds else None
+    count = 0
+    async with websockets.connect(url) as ws:
+        await ws.send(json.dumps({'type': 'subscribe', 'symbols': symbols}))
+        with open(path, 'w') as f:
+            while stopping is None or time.monotonic() < stopping:
+                timeout = None if stopping is None else max(stopping - time.monotonic(), 0)
+                try:
+                    message = await asyncio.wait_for(ws.recv(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                data = json.loads(message)
+                data['t'] = time.time()
+                f.write(json.dumps(data) + '\n')
+                count += 1
+    print(f"Recorded {count} messages to {path}")
+
+async def check_ws_manager(port=SIMULATOR_PORT):
+    """Exercise WebSocketManager against a local simulator; returns the failed checks
+
+    Checks subscription filtering, resubscribing on set_symbols, restoring
+    the subscription after the server drops the connection, and that
+    backoff keeps growing against a server that accepts and then closes.
+    """
+    from ws_manager import WebSocketManager
+
+    symbols = symbol_universe(6)
+    received = []
+
+    async def on_quote(symbol, price, volume, sent_at):
+        received.append(symbol)
+
+    failures = []
+
+    def check(name, ok):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+        if not ok:
+            failures.append(name)
+
+    simulator = MarketSimulator(RandomWalkFeed(symbols, rate=600, seed=1), port=port)
+    server = asyncio.create_task(simulator.run())
+    stopping = asyncio.Event()
+    manager = WebSocketManager(f'ws://127.0.0.1:{port}', on_quote, symbols[:2], base_delay=0.05, max_delay=1.0)
+    client = asyncio.create_task(manager.run(stopping))
+    try:
+        await asyncio.sleep(1.0)
+        check("receives subscribed symbols only", bool(received) and set(received) <= set(symbols[:2]))
+
+        await manager.set_symbols(symbols[1:3])
+        await asyncio.sleep(0.2)
+        received.clear()
+        await asyncio.sleep(1.0)
+        check("set_symbols changes the subscription", bool(received) and set(received) <= set(symbols[1:3]))
+
+        for ws in list(simulator.clients):
+            await ws.close()
+        await asyncio.sleep(0.3)
+        received.clear()
+        await asyncio.sleep(1.0)
+        check("reconnects after the server drops the connection", manager.stats['connects'] >= 2)
+        check("restores the subscription after reconnecting", bool(received) and set(received) <= set(symbols[1:3]))
+        check("resets backoff after data arrives", manager.stats['retry_attempt'] <= 1)
+    finally:
+        stopping.set()
+        client.cancel()
+        server.cancel()
+        await asyncio.gather(client, server, return_exceptions=True)
+
+    async def drop(ws):
+        # Accept the subscription, then hang up without sending anything
+        await ws.recv()
+        await ws.close()
+
+    async with websockets.serve(drop, '127.0.0.1', port + 1):
+        stopping = asyncio.Event()
+        flaky = WebSocketManager(f'ws://127.0.0.1:{port + 1}', on_quote, symbols[:1], base_delay=0.05, max_delay=5.0)
+        client = asyncio.create_task(flaky.run(stopping))
+        await asyncio.sleep(2.0)
+        stopping.set()
+        client.cancel()
+        await asyncio.gather(client, return_exceptions=True)
+    # With full jitter, 2 s of growing delays from 50 ms allows only a handful of attempts
+    check("backoff grows against a server that accepts and closes",
+          flaky.stats['retry_attempt'] >= 3 and flaky.stats['connects'] < 15)
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Local market-data simulator")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    random_walk = commands.add_parser('random', help="Serve random-walk quotes")
+    random_walk.add_argument('--symbols', type=int, default=100, help="Number of synthetic SAAAA-style symbols")
+    random_walk.add_argument('--rate', type=float, default=1000, help="Quotes per second")
+    random_walk.add_argument('--seed', type=int)
+
+    replay = commands.add_parser('replay', help="Replay a JSON-lines recording or OHLCV CSV files")
+    replay.add_argument('paths', nargs='+')
+    replay.add_argument('--speed', type=float, default=1.0, help="Replay speed multiplier (1-1000)")
+
+    for command in (random_walk, replay):
+        command.add_argument('--host', default='127.0.0.1')
+        command.add_argument('--port', type=int, default=SIMULATOR_PORT)
+
+    recorder = commands.add_parser('record', help="Record a websocket feed to JSON lines")
+    recorder.add_argument('url')
+    recorder.add_argument('symbols', nargs='+')
+    recorder.add_argument('-o', '--output', required=True)
+    recorder.add_argument('--seconds', type=float)
+
+    checker = commands.add_parser('check', help="Check the ingestion websocket client against a local simulator")
+    checker.add_argument('--port', type=int, default=SIMULATOR_PORT)
+
+    args = parser.parse_args()
+    if args.command == 'check':
+        return 1 if asyncio.run(check_ws_manager(args.port)) else 0
+    if args.command == 'record':
+        asyncio.run(record(args.url, args.symbols, args.output, args.seconds))
+        return 0
+
+    if args.command == 'random':
+        feed = RandomWalkFeed(symbol_universe(args.symbols), rate=args.rate, seed=args.seed)
+        speed = 1.0
+    else:
+        if not 1 <= args.speed <= 1000:
+            parser.error("--speed must be between 1 and 1000")
+        feed = replay_feed(args.paths)
+        speed = args.speed
+    try:
+        asyncio.run(MarketSimulator(feed, args.host, args.port, speed).run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
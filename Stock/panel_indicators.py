@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+def panel_from_frames(frames):
+    """Align per-symbol OHLCV frames into time x symbol panels
+
+    Returns {'close', 'high', 'low', 'volume'} DataFrames on the union of
+    the frames' timestamps, with NaN where a symbol has no bar, ready to
+    pass to compute_panel_indicators(**panels).
+    """
+    return {
+        name: pd.concat({symbol: frame[column] for symbol, frame in frames.items()}, axis=1)
+        for name, column in (('close', 'Close'), ('high', 'High'), ('low', 'Low'), ('volume', 'Volume'))
+    }
+
+def rolling_mean(x, window):
+    """Rolling mean down axis 0; NaN unless all window values are present and finite"""
+    out = np.full(x.shape, np.nan)
+    if len(x) < window:
+        return out
+    valid = np.isfinite(x)
+    complete = valid.all()
+    sums = np.cumsum(x if complete else np.where(valid, x, 0.0), axis=0)
+    window_sums = sums[window - 1:].copy()
+    window_sums[1:] -= sums[:-window]
+    window_sums /= window
+    if not complete:
+        counts = np.cumsum(valid, axis=0)
+        window_counts = counts[window - 1:].copy()
+        window_counts[1:] -= counts[:-window]
+        window_sums[window_counts != window] = np.nan
+    out[window - 1:] = window_sums
+    return out
+
+def rolling_std(x, window):
+    """Rolling sample standard deviation down axis 0"""
+    # pandas' 2-D rolling std is both faster and steadier than a NumPy version here
+    return pd.DataFrame(x).rolling(window).std().to_numpy()
+
+def rolling_extreme(x, window, reduce):
+    """Rolling reduce (e.g. np.min or np.max) over each window down axis 0"""
+    out = np.full(x.shape, np.nan)
+    if len(x) >= window:
+        out[window - 1:] = reduce(sliding_window_view(x, window, axis=0), axis=-1)
+    return out
+
+def ewm(x, span):
+    """Exponential moving average down axis 0, as pandas ewm(span, adjust=False)"""
+    return pd.DataFrame(x).ewm(span=span, adjust=False).mean().to_numpy()
+
+def rsi(c, window):
+    """Relative strength index of a close array down axis 0"""
+    # The first bar of each symbol counts as a zero gain and loss
+    delta = np.diff(c, axis=0, prepend=np.nan)
+    present = ~np.isnan(c)
+    gain = np.where(present, np.where(delta > 0, delta, 0.0), np.nan)
+    loss = np.where(present, np.where(delta < 0, -delta, 0.0), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 - (100 / (1 + rolling_mean(gain, window) / rolling_mean(loss, window)))
+
+def compute_panel_indicators(close, high=None, low=None, volume=None, index=None, symbols=None, lean=False):
+    """Technical indicators for many symbols in one vectorized sweep
+
+    Takes time x symbol closes (and optionally highs, lows and volumes) as
+    DataFrames or 2-D arrays; missing highs/lows default to the closes.
+    Each indicator is computed for every column at once, using the same
+    formulas and windows as stock_utils.calculate_technical_indicators.
+    Rows where a symbol has no bar are NaN, and windows that include one
+    are NaN, so symbols with different histories can share a panel.
+
+    Returns a DataFrame with (field, symbol) columns, so panel['RSI'] is a
+    time x symbol frame. With lean=True prices and indicators are float32
+    and there is no BB_middle field (it equals SMA_20).
+    """
+    if isinstance(close, pd.DataFrame):
+        index, symbols = close.index, close.columns
+    c = np.asarray(close, dtype='float64')
+    h = c if high is None else np.asarray(high, dtype='float64')
+    l = c if low is None else np.asarray(low, dtype='float64')
+    if index is None:
+        index = pd.RangeIndex(c.shape[0])
+    if symbols is None:
+        symbols = pd.RangeIndex(c.shape[1])
+
+    fields = {'Close': c, 'High': h, 'Low': l}
+
+    fields['RSI'] = rsi(c, 14)
+
+    # Moving averages
+    fields['SMA_20'] = rolling_mean(c, 20)
+    fields['SMA_50'] = rolling_mean(c, 50)
+    fields['SMA_200'] = rolling_mean(c, 200)
+    fields['EMA_12'] = ewm(c, 12)
+    fields['EMA_26'] = ewm(c, 26)
+
+    # MACD
+    fields['MACD'] = fields['EMA_12'] - fields['EMA_26']
+    fields['Signal'] = ewm(fields['MACD'], 9)
+    fields['MACD_Histogram'] = fields['MACD'] - fields['Signal']
+
+    # Bollinger Bands around the 20-bar SMA
+    std_20 = rolling_std(c, 20)
+    if not lean:
+        fields['BB_middle'] = fields['SMA_20']
+    fields['BB_upper'] = fields['SMA_20'] + 2 * std_20
+    fields['BB_lower'] = fields['SMA_20'] - 2 * std_20
+
+    # Stochastic Oscillator
+    low_min = rolling_extreme(l, 14, np.min)
+    high_max = rolling_extreme(h, 14, np.max)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fields['%K'] = 100 * (c - low_min) / (high_max - low_min)
+    fields['%D'] = rolling_mean(fields['%K'], 3)
+
+    # One block for the whole panel instead of a frame per field
+    n = c.shape[1]
+    values = np.empty((c.shape[0], n * len(fields)), dtype='float32' if lean else 'float64')
+    for i, array in enumerate(fields.values()):
+        values[:, i * n:(i + 1) * n] = array
+    columns = pd.MultiIndex.from_product([list(fields), symbols], names=['field', 'symbol'])
+    panel = pd.DataFrame(values, index=index, columns=columns)
+    if volume is not None:
+        # Volume stays float64 (NaN where a symbol has no bar) in both modes
+        volume = pd.DataFrame(
+            np.asarray(volume, dtype='float64'), index=index,
+            columns=pd.MultiIndex.from_product([['Volume'], symbols], names=['field', 'symbol'])
+        )
+        panel = pd.concat([panel, volume], axis=1)
+    return panel
+
+def latest_values(panel, lookback=5):
+    """Symbol x field frame of each symbol's most recent values
+
+    Symbols whose last bar is missing use their latest bar within the
+    final lookback rows.
+    """
+    latest = panel.iloc[-lookback:].ffill().iloc[-1]
+    return latest.unstack(level=0)[list(dict.fromkeys(panel.columns.get_level_values(0)))]
+
+def compute_latest_values(close, high=None, low=None, volume=None, index=None, symbols=None):
+    """Symbol x field frame of the latest indicator values for a panel
+
+    Shorthand for latest_values(compute_panel_indicators(...)); a top-level
+    function so worker processes can run it on blocks of symbols.
+    """
+    return latest_values(compute_panel_indicators(close, high, low, volume, index=index, symbols=symbols))
@@ -0,0 +1,163 @@
+"""Vectorized stock screener over cached daily history.
+
+Loads the universe's daily bars from historical_prices (or the bar store
+when BAR_STORE_DIR is set) in one bulk read, computes every indicator for
+all symbols with panel_indicators, and filters/ranks the latest values
+with pandas expressions:
+
+    snapshot = build_snapshot(symbols)
+    screen(snapshot, "RSI < 30 and Close > SMA_200")
+    screen(snapshot, rank_by="MACD_Histogram", top=20)
+
+Large universes are split across a shared pool of worker processes.
+Screen expressions are parsed and checked against a whitelist of column
+names, numbers and operators before pandas evaluates them.
+"""
+import ast
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import stock_utils
+from database import get_db_connection
+from panel_indicators import compute_latest_values, panel_from_frames
+
+SCREENER_WORKERS = int(os.getenv('SCREENER_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Universes with more symbols than this are split across worker processes
+SCREENER_PARALLEL_THRESHOLD = int(os.getenv('SCREENER_PARALLEL_THRESHOLD', '1000'))
+# Daily bars loaded per symbol; enough for SMA_200
+SCREENER_PERIOD = '1y'
+
+# Indicator columns renamed so they can be used in query expressions
+SCREEN_COLUMN_NAMES = {'%K': 'Stoch_K', '%D': 'Stoch_D'}
+# Syntax allowed in screen expressions: columns, numbers, comparisons,
+# and/or/not and arithmetic. No attributes, calls or subscripts.
+_ALLOWED_NODES = (
+    ast.Expression, ast.Name, ast.Load, ast.Constant,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.BoolOp, ast.And, ast.Or,
+    ast.UnaryOp, ast.Not, ast.USub, ast.UAdd, ast.Invert,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.BitAnd, ast.BitOr
+)
+
+# One pool for the process, started on first use. Spawned rather than
+# forked, since the Streamlit server is multi-threaded.
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+def load_history_panels(symbols=None, period=SCREENER_PERIOD):
+    """Load cached daily bars for many symbols as time x symbol panels
+
+    Returns {'close', 'high', 'low', 'volume'} DataFrames, reading the
+    whole universe in one query. Symbols without cached history are
+    missing from the panels.
+    """
+    start = pd.Timestamp.now().normalize() - stock_utils.HISTORY_PERIODS[period]
+    if stock_utils.bar_store is not None:
+        symbols = symbols or stock_utils.bar_store.symbols('1d')
+        frames = {symbol: stock_utils.bar_store.read(symbol, '1d', start=start) for symbol in symbols}
+        frames = {symbol: frame for symbol, frame in frames.items() if len(frame)}
+        return panel_from_frames(frames) if frames else None
+
+    query = '''
+        SELECT symbol, date, high_price::float8, low_price::float8,
+               close_price::float8, volume::float8
+        FROM historical_prices
+        WHERE date >= %s
+    '''
+    params = [start.to_pydatetime()]
+    if symbols:
+        query += ' AND symbol = ANY(%s)'
+        params.append(list(symbols))
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+    if not rows:
+        return None
+
+    bars = pd.DataFrame(rows, columns=['symbol', 'date', 'high', 'low', 'close', 'volume'])
+    return {
+        name: bars.pivot(index='date', columns='symbol', values=name)
+        for name in ('close', 'high', 'low', 'volume')
+    }
+
+def compute_snapshot(panels, workers=SCREENER_WORKERS, parallel_threshold=SCREENER_PARALLEL_THRESHOLD):
+    """Symbol x indicator frame of each symbol's latest values"""
+    close = panels['close']
+    index, symbols = close.index, close.columns
+    arrays = [panels[name].to_numpy(dtype='float64') for name in ('close', 'high', 'low', 'volume')]
+
+    if len(symbols) <= parallel_threshold or workers <= 1:
+        snapshot = compute_latest_values(*arrays, index=index, symbols=symbols)
+    else:
+        pool = _get_pool(workers)
+        bounds = np.linspace(0, len(symbols), workers + 1).astype(int)
+        futures = [
+            pool.submit(compute_latest_values, *[a[:, lo:hi] for a in arrays], index=index, symbols=symbols[lo:hi])
+            for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo
+        ]
+        snapshot = pd.concat([future.result() for future in futures]).sort_index()
+
+    snapshot = snapshot.rename(columns=SCREEN_COLUMN_NAMES)
+    snapshot.index.name = 'Symbol'
+    snapshot.columns.name = None
+    return snapshot.dropna(subset=['Close'])
+
+def build_snapshot(symbols=None, period=SCREENER_PERIOD):
+    """Load history for a universe and compute its indicator snapshot"""
+    panels = load_history_panels(symbols, period)
+    if panels is None:
+        return pd.DataFrame()
+    return compute_snapshot(panels)
+
+def validate_expression(text, columns):
+    """Raise ValueError unless text only uses the given columns, numbers and operators"""
+    try:
+        tree = ast.parse(text, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Invalid screen expression: {e.msg}") from e
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax in screen expression: {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id not in columns:
+            raise ValueError(f"Unknown column in screen expression: {node.id}")
+        if isinstance(node, ast.Constant) and (
+            isinstance(node.value, bool) or not isinstance(node.value, (int, float))
+        ):
+            raise ValueError(f"Only numbers are allowed in screen expressions: {node.value!r}")
+
+def screen(snapshot, expression=None, rank_by=None, ascending=False, top=None):
+    """Filter a snapshot with a query expression and rank it
+
+    expression is a DataFrame.query string over the snapshot columns,
+    e.g. "RSI < 30 and Close > SMA_200". rank_by is a column name or
+    expression (e.g. "Close / SMA_200"); its value is added as Score.
+    Both may only use columns, numbers, comparisons, and/or/not and
+    arithmetic. Raises ValueError for an invalid expression.
+    """
+    result = snapshot
+    for text in (expression, rank_by):
+        if text:
+            validate_expression(text, set(snapshot.columns))
+    try:
+        if expression:
+            result = result.query(expression, local_dict={}, global_dict={})
+        if rank_by:
+            score = result.eval(rank_by, local_dict={}, global_dict={})
+            result = result.assign(Score=score).sort_values('Score', ascending=ascending, na_position='last')
+    except Exception as e:
+        raise ValueError(f"Invalid screen expression: {e}") from e
+    if top:
+        result = result.head(top)
+    return result
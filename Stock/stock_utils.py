@@ -1,57 +1,142 @@
 import yfinance as yf
 import pandas as pd
 import numpy as np
+import metrics
 from database import get_db_connection
-import websocket
-import json
+from alert_index import ALERT_CHANNEL
+from streaming_indicators import IndicatorState
+from ttl_cache import TTLCache
+from bar_store import BarStore
+from bar_aggregator import (
+    BAR_INTERVALS, MARKET_TZ, SESSION_CLOSE, SESSION_OPEN, load_intraday_bars, store_intraday_frame
+)
+from chart_utils import downsample_ohlc, reduced_line_trace
+from psycopg2.extras import execute_values
+import os
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import time
+from decimal import Decimal
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import re
 import requests
 
+# Serve yfinance calls from the local market simulator for offline load tests
+if os.getenv('MARKET_SIMULATOR'):
+    from market_simulator import SimulatedYFinance
+    yf = SimulatedYFinance(os.getenv('MARKET_SIMULATOR_BARS'))
+
+YFINANCE_SECONDS = metrics.histogram('yfinance_request_seconds', 'yfinance call latency', ['call'])
+YFINANCE_ERRORS = metrics.counter('yfinance_errors_total', 'Failed yfinance calls', ['call'])
+
+def yfinance_call(call):
+    """Context manager timing a yfinance call and counting its failures"""
+    return metrics.timed(YFINANCE_SECONDS, YFINANCE_ERRORS, call=call)
+
+def fetch_history(symbol, **kwargs):
+    """Ticker.history for a symbol, instrumented"""
+    with yfinance_call('history'):
+        return yf.Ticker(symbol).history(**kwargs)
+
+# Tier 1: in-process price cache shared by all sessions in this process
+PRICE_CACHE_TTL = float(os.getenv('PRICE_CACHE_TTL', '5'))
+PRICE_CACHE_SIZE = int(os.getenv('PRICE_CACHE_SIZE', '2048'))
+price_cache = TTLCache(maxsize=PRICE_CACHE_SIZE, ttl=PRICE_CACHE_TTL)
+
+# Tier 2 (real_time_prices freshness check) and fallback counters
+_price_tier_lock = threading.Lock()
+_price_tier_stats = {'db_hits': 0, 'db_misses': 0, 'fallback_fetches': 0}
+
+def _count_price_tier(name, amount=1):
+    if amount:
+        with _price_tier_lock:
+            _price_tier_stats[name] += amount
+
+def get_price_cache_stats():
+    """Get hit/miss counters for each price lookup tier"""
+    memory = price_cache.stats()
+    with _price_tier_lock:
+        tiers = dict(_price_tier_stats)
+    return {
+        'memory_hits': memory['hits'],
+        'memory_misses': memory['misses'],
+        'memory_size': memory['size'],
+        **tiers
+    }
+
+def _cache_request_counts():
+    prices = get_price_cache_stats()
+    figures = figure_cache.stats()
+    return {
+        ('price_memory', 'hit'): prices['memory_hits'],
+        ('price_memory', 'miss'): prices['memory_misses'],
+        ('price_db', 'hit'): prices['db_hits'],
+        ('price_db', 'miss'): prices['db_misses'],
+        ('figure', 'hit'): figures['hits'],
+        ('figure', 'miss'): figures['misses']
+    }
+
+metrics.counter('cache_requests_total', 'Cache lookups by cache and result', ['cache', 'result']).set_function(
+    _cache_request_counts
+)
+
 def get_real_time_price(symbol):
     """Get real-time price data with fallback mechanisms"""
-    # Try getting from database first
+    # Try the in-process cache first
+    price_data = price_cache.get(symbol)
+    if price_data:
+        return price_data
+
+    # Then the database freshness check
     price_data = get_stored_real_time_price(symbol)
     if price_data:
+        _count_price_tier('db_hits')
+        price_cache.set(symbol, price_data)
         return price_data
+    _count_price_tier('db_misses')
+    _count_price_tier('fallback_fetches')
 
     # Fallback to yfinance if database data is not fresh
     try:
-        ticker = yf.Ticker(symbol)
-        current_data = ticker.history(period='1d', interval='1m').iloc[-1]
+        current_data = fetch_history(symbol, period='1d', interval='1m').iloc[-1]
+        # Stamp the quote with its bar's time, not the time it was fetched
+        quote_time = current_data.name
+        if quote_time.tzinfo is not None:
+            quote_time = quote_time.tz_convert(datetime.now().astimezone().tzinfo).tz_localize(None)
         price_data = {
             'price': float(current_data['Close']),
             'volume': int(current_data['Volume']),
-            'timestamp': datetime.now()
+            'timestamp': quote_time.to_pydatetime()
         }
-        # Store in database for future use
-        store_real_time_price(symbol, price_data['price'], price_data['volume'])
+        # Only the ingestion daemon writes real_time_prices; keep this in process
+        price_cache.set(symbol, price_data)
         return price_data
     except Exception as e:
         print(f"Error fetching real-time price for {symbol}: {e}")
         return None
 
-def store_real_time_price(symbol, price, volume):
-    """Store real-time price in database with error handling"""
+def store_real_time_prices(quotes):
+    """Bulk upsert a {symbol: (price, volume)} mapping in one statement"""
+    if not quotes:
+        return 0
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
+            execute_values(cursor, '''
                 INSERT INTO real_time_prices (symbol, price, volume)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (symbol) 
-                DO UPDATE SET 
-                    price = %s, 
-                    volume = %s, 
+                VALUES %s
+                ON CONFLICT (symbol)
+                DO UPDATE SET
+                    price = EXCLUDED.price,
+                    volume = EXCLUDED.volume,
                     timestamp = CURRENT_TIMESTAMP
-            ''', (symbol, price, volume, price, volume))
+            ''', [(symbol, price, volume) for symbol, (price, volume) in quotes.items()])
             conn.commit()
+            return len(quotes)
     except Exception as e:
-        print(f"Error storing real-time price: {e}")
+        print(f"Error storing real-time prices: {e}")
+        return 0
 
 def get_stored_real_time_price(symbol):
     """Get real-time price from database with freshness check"""
@@ -75,100 +160,165 @@ def get_stored_real_time_price(symbol):
         print(f"Error fetching stored real-time price: {e}")
     return None
 
-def update_stock_prices():
-    """Background task to update stock prices"""
-    while True:
-        try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                # Get all unique symbols from watchlist and portfolio
-                cursor.execute('''
-                    SELECT DISTINCT symbol 
-                    FROM (
-                        SELECT symbol FROM watchlist
-                        UNION
-                        SELECT symbol FROM portfolio
-                    ) AS symbols
-                ''')
-                symbols = [row[0] for row in cursor.fetchall()]
-
-                # Update prices for each symbol
-                for symbol in symbols:
-                    try:
-                        ticker = yf.Ticker(symbol)
-                        current_data = ticker.history(period='1d', interval='1m').iloc[-1]
-                        store_real_time_price(
-                            symbol,
-                            float(current_data['Close']),
-                            int(current_data['Volume'])
-                        )
-                    except Exception as e:
-                        print(f"Error updating price for {symbol}: {e}")
-                        continue
+# Batched polling settings
+PRICE_POLL_INTERVAL = int(os.getenv('PRICE_POLL_INTERVAL', '60'))
+PRICE_POLL_CHUNK_SIZE = int(os.getenv('PRICE_POLL_CHUNK_SIZE', '100'))
+PRICE_POLL_WORKERS = int(os.getenv('PRICE_POLL_WORKERS', '4'))
 
+def get_tracked_symbols():
+    """Get all unique symbols from watchlist and portfolio"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT DISTINCT symbol 
+            FROM (
+                SELECT symbol FROM watchlist
+                UNION
+                SELECT symbol FROM portfolio
+            ) AS symbols
+        ''')
+        return [row[0] for row in cursor.fetchall()]
+
+def fetch_quote_chunk(symbols):
+    """Fetch the latest 1m bar for a chunk of symbols in one multi-ticker request"""
+    quotes = {}
+    with yfinance_call('download'):
+        data = yf.download(
+            symbols,
+            period='1d',
+            interval='1m',
+            group_by='ticker',
+            threads=False,
+            progress=False
+        )
+    if data.empty:
+        return quotes
+
+    for symbol in symbols:
+        try:
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                bars = data[symbol]
+            else:
+                bars = data
+            bars = bars.dropna(subset=['Close'])
+            if bars.empty:
+                continue
+            last = bars.iloc[-1]
+            quotes[symbol] = (float(last['Close']), int(last['Volume']))
         except Exception as e:
-            print(f"Error in price update loop: {e}")
+            print(f"Error parsing quote for {symbol}: {e}")
+    return quotes
+
+def quote_chunks(symbols, chunk_size=None):
+    """Split symbols into sorted chunks of at most chunk_size for fetch_quote_chunk"""
+    chunk_size = chunk_size or PRICE_POLL_CHUNK_SIZE
+    symbols = sorted(set(symbols))
+    return [symbols[i:i + chunk_size] for i in range(0, len(symbols), chunk_size)]
 
-        # Wait before next update
-        time.sleep(60)  # Update every minute
+def fetch_latest_quotes(symbols, chunk_size=None, max_workers=None):
+    """Fetch latest quotes for many symbols using chunked, concurrent requests"""
+    max_workers = max_workers or PRICE_POLL_WORKERS
+    chunks = quote_chunks(symbols, chunk_size)
+    if not chunks:
+        return {}
 
-# Start the background price update thread
-def start_price_updates():
-    """Start the background price update thread"""
-    update_thread = threading.Thread(target=update_stock_prices)
-    update_thread.daemon = True
-    update_thread.start()
+    quotes = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        futures = {executor.submit(fetch_quote_chunk, chunk): chunk for chunk in chunks}
+        for future, chunk in futures.items():
+            try:
+                quotes.update(future.result())
+            except Exception as e:
+                print(f"Error fetching quotes for {chunk[0]}..{chunk[-1]}: {e}")
+    return quotes
 
-def on_message(ws, message):
-    """Handle incoming websocket messages"""
+def get_stored_real_time_prices(symbols):
+    """Get fresh real-time prices for several symbols in one query"""
+    prices = {}
     try:
-        data = json.loads(message)
-        if 'data' in data:
-            for quote in data['data']:
-                symbol = quote['s']
-                price = float(quote['p'])
-                volume = int(quote.get('v', 0))
-                store_real_time_price(symbol, price, volume)
-                check_price_alerts(symbol, price)
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT symbol, price, volume, timestamp
+                FROM real_time_prices
+                WHERE symbol = ANY(%s) AND
+                      timestamp > NOW() - INTERVAL '1 minute'
+            ''', (list(symbols),))
+            for symbol, price, volume, timestamp in cursor.fetchall():
+                prices[symbol] = {
+                    'price': float(price),
+                    'volume': int(volume),
+                    'timestamp': timestamp
+                }
     except Exception as e:
-        print(f"Error processing message: {e}")
+        print(f"Error fetching stored real-time prices: {e}")
+    return prices
 
-def on_error(ws, error):
-    print(f"WebSocket error: {error}")
+def get_real_time_prices(symbols):
+    """Get real-time prices for many symbols, batching database and fallback lookups"""
+    symbols = sorted(set(symbols))
+    if not symbols:
+        return {}
 
-def on_close(ws, close_status_code, close_msg):
-    print(f"WebSocket connection closed: {close_status_code} - {close_msg}")
-    # Try to reconnect after a delay
-    time.sleep(5)
-    start_websocket([])
+    prices = {}
+    for symbol in symbols:
+        price_data = price_cache.get(symbol)
+        if price_data:
+            prices[symbol] = price_data
+    uncached = [symbol for symbol in symbols if symbol not in prices]
+    if not uncached:
+        return prices
 
-def on_open(ws):
-    print("WebSocket connection opened")
-    try:
-        subscribe_message = {
-            "type": "subscribe",
-            "symbols": ["*"]  # Subscribe to all available symbols
-        }
-        ws.send(json.dumps(subscribe_message))
-    except Exception as e:
-        print(f"Error subscribing to updates: {e}")
+    stored = get_stored_real_time_prices(uncached)
+    _count_price_tier('db_hits', len(stored))
+    _count_price_tier('db_misses', len(uncached) - len(stored))
+    prices.update(stored)
 
-def start_websocket(symbols):
-    """Start WebSocket connection for real-time data"""
-    try:
-        ws = websocket.WebSocketApp(
-            "wss://stream.data.alpaca.markets/v2/iex",
-            on_message=on_message,
-            on_error=on_error,
-            on_close=on_close,
-            on_open=on_open
-        )
+    missing = [symbol for symbol in uncached if symbol not in stored]
+    if missing:
+        _count_price_tier('fallback_fetches', len(missing))
+        quotes = fetch_latest_quotes(missing)
+        now = datetime.now()
+        for symbol, (price, volume) in quotes.items():
+            prices[symbol] = {'price': price, 'volume': volume, 'timestamp': now}
+
+    for symbol in uncached:
+        if symbol in prices:
+            price_cache.set(symbol, prices[symbol])
+    return prices
 
-        wst = threading.Thread(target=ws.run_forever)
-        wst.daemon = True
-        wst.start()
+WEBSOCKET_URL = os.getenv('WEBSOCKET_URL', 'wss://stream.data.alpaca.markets/v2/iex')
+
+def get_ingest_status(name='default'):
+    """Get the ingestion daemon's status and seconds since its last heartbeat"""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT status, hostname, pid, started_at, heartbeat_at,
+                       EXTRACT(EPOCH FROM (NOW() - heartbeat_at)),
+                       last_pass_seconds, symbols_tracked, quotes_written
+                FROM ingest_status
+                WHERE name = %s
+            ''', (name,))
+            row = cursor.fetchone()
+            if row:
+                return {
+                    'status': row[0],
+                    'hostname': row[1],
+                    'pid': row[2],
+                    'started_at': row[3],
+                    'heartbeat_at': row[4],
+                    'heartbeat_age': float(row[5]),
+                    'last_pass_seconds': row[6],
+                    'symbols_tracked': row[7],
+                    'quotes_written': row[8]
+                }
     except Exception as e:
-        print(f"Error starting WebSocket: {e}")
+        print(f"Error fetching ingest status: {e}")
+    return None
 
 def is_valid_stock_symbol(symbol):
     """Validate stock symbol format"""
@@ -177,56 +327,383 @@ def is_valid_stock_symbol(symbol):
     # Basic validation for common stock symbol formats
     return bool(re.match(r'^[A-Z]{1,5}(\.[A-Z]{1,2})?$', symbol))
 
-def get_stock_data(symbol, period='1y'):
-    """Get stock data with error handling and validation"""
+# Daily history cache settings
+HISTORY_PERIODS = {
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10)
+}
+HISTORY_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+# Allowed gap between the requested start and the first cached bar
+# (weekends and market holidays)
+HISTORY_START_SLACK = pd.Timedelta(days=7)
+HISTORY_REFRESH_SECONDS = int(os.getenv('HISTORY_REFRESH_SECONDS', '300'))
+# Serve daily history from a local memory-mapped bar store instead of historical_prices
+BAR_STORE_DIR = os.getenv('BAR_STORE_DIR')
+bar_store = BarStore(BAR_STORE_DIR) if BAR_STORE_DIR else None
+
+def normalize_history(hist):
+    """Keep OHLCV columns with a timezone-naive index as stored in historical_prices"""
+    hist = hist[HISTORY_COLUMNS].dropna(subset=['Close']).copy()
+    if hist.index.tz is not None:
+        hist.index = hist.index.tz_localize(None)
+    hist.index.name = 'Date'
+    hist['Volume'] = hist['Volume'].fillna(0).astype('int64')
+    return hist
+
+def covers_start(hist, start, first_available=None):
+    """Whether hist reaches back to start, or to the source's first bar if that is later"""
+    if hist.empty:
+        return False
+    if first_available is not None:
+        start = max(start, first_available)
+    return hist.index[0] <= start + HISTORY_START_SLACK
+
+def source_first_bar(fetched, start):
+    """First bar of a full-period download if the source has nothing back to start, else None"""
+    if fetched.empty or fetched.index[0] <= start + HISTORY_START_SLACK:
+        return None
+    return fetched.index[0]
+
+def load_cached_history(symbol, start):
+    """Load cached daily bars since start, plus the age in seconds of the newest bar"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT date, open_price, high_price, low_price, close_price,
+                   volume, EXTRACT(EPOCH FROM (NOW() - updated_at))
+            FROM historical_prices
+            WHERE symbol = %s AND date >= %s
+            ORDER BY date
+        ''', (symbol, start.to_pydatetime()))
+        rows = cursor.fetchall()
+
+    if not rows:
+        return pd.DataFrame(columns=HISTORY_COLUMNS), None
+    hist = pd.DataFrame(
+        [row[1:6] for row in rows],
+        index=pd.DatetimeIndex([row[0] for row in rows], name='Date'),
+        columns=HISTORY_COLUMNS
+    )
+    hist = hist.astype({
+        'Open': 'float64', 'High': 'float64', 'Low': 'float64',
+        'Close': 'float64', 'Volume': 'int64'
+    })
+    return hist, float(rows[-1][6])
+
+def has_corporate_actions(fetched, after):
+    """Whether a download has a dividend or split after a bar, which re-bases the adjusted prices before it"""
+    actions = [column for column in ('Dividends', 'Stock Splits') if column in fetched.columns]
+    if not actions or fetched.empty:
+        return False
+    index = fetched.index.tz_localize(None) if fetched.index.tz is not None else fetched.index
+    return bool((fetched.loc[index > after, actions].fillna(0) != 0).any(axis=None))
+
+def store_historical_prices(symbol, hist, replace=False):
+    """Bulk upsert daily bars into historical_prices; replace drops the symbol's other bars"""
+    if hist.empty:
+        return 0
+    rows = [
+        (symbol, ts.to_pydatetime(), float(o), float(h), float(l), float(c), int(v))
+        for ts, o, h, l, c, v in zip(
+            hist.index, hist['Open'], hist['High'], hist['Low'],
+            hist['Close'], hist['Volume']
+        )
+    ]
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            if replace:
+                cursor.execute('DELETE FROM historical_prices WHERE symbol = %s', (symbol,))
+            execute_values(cursor, '''
+                INSERT INTO historical_prices
+                (symbol, date, open_price, high_price, low_price, close_price, volume)
+                VALUES %s
+                ON CONFLICT (symbol, date)
+                DO UPDATE SET
+                    open_price = EXCLUDED.open_price,
+                    high_price = EXCLUDED.high_price,
+                    low_price = EXCLUDED.low_price,
+                    close_price = EXCLUDED.close_price,
+                    volume = EXCLUDED.volume,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', rows, page_size=1000)
+            conn.commit()
+        return len(rows)
+    except Exception as e:
+        print(f"Error storing historical prices: {e}")
+        return 0
+
+def load_first_available(symbol):
+    """Earliest daily bar the source has for a symbol, if recorded, else None"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT first_available FROM history_bounds WHERE symbol = %s', (symbol,)
+        )
+        row = cursor.fetchone()
+    return pd.Timestamp(row[0]) if row and row[0] is not None else None
+
+def store_first_available(symbol, first_available):
+    """Record the earliest daily bar the source has (None when it reaches back further)"""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO history_bounds (symbol, first_available)
+                VALUES (%s, %s)
+                ON CONFLICT (symbol)
+                DO UPDATE SET
+                    first_available = EXCLUDED.first_available,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (symbol, first_available.to_pydatetime() if first_available is not None else None))
+            conn.commit()
+    except Exception as e:
+        print(f"Error storing history bounds: {e}")
+
+def get_history(symbol, period='1y'):
+    """Get daily OHLCV bars, serving from historical_prices and fetching only missing bars"""
+    offset = HISTORY_PERIODS.get(period)
+    if offset is None:
+        # Open-ended periods such as 'ytd' or 'max' bypass the cache
+        return normalize_history(fetch_history(symbol, period=period))
+
+    start = pd.Timestamp.now().normalize() - offset
+    if bar_store is not None:
+        return get_stored_history(symbol, period, start)
+    first_available = None
+    try:
+        cached, age = load_cached_history(symbol, start)
+        if not covers_start(cached, start):
+            # A symbol listed after start is complete from its first bar
+            first_available = load_first_available(symbol)
+    except Exception as e:
+        print(f"Error loading cached history for {symbol}: {e}")
+        cached, age = pd.DataFrame(columns=HISTORY_COLUMNS), None
+
+    full = not covers_start(cached, start, first_available)
+    rebased = False
+    if full:
+        fetched = fetch_history(symbol, period=period)
+    elif age is not None and age < HISTORY_REFRESH_SECONDS:
+        return cached
+    else:
+        # Re-fetch from the newest cached bar so a partial session is completed
+        fetched = fetch_history(symbol, start=cached.index[-1].strftime('%Y-%m-%d'))
+        if has_corporate_actions(fetched, cached.index[-1]):
+            # The cached bars were adjusted before the dividend or split;
+            # replace them with a full download adjusted on the same basis
+            full = rebased = True
+            fetched = fetch_history(symbol, period=period)
+
+    if fetched.empty:
+        return cached
+    fetched = normalize_history(fetched)
+    store_historical_prices(symbol, fetched, replace=rebased)
+    if full:
+        store_first_available(symbol, source_first_bar(fetched, start))
+
+    if cached.empty or rebased:
+        return fetched
+    return pd.concat([cached[cached.index < fetched.index[0]], fetched])
+
+def get_stored_history(symbol, period, start):
+    """get_history backed by the bar store; the result maps the store's files"""
+    stored = bar_store.read(symbol, '1d', start=start)
+    if not covers_start(stored, start, bar_store.first_available(symbol, '1d')):
+        fetched = fetch_history(symbol, period=period)
+        if fetched.empty:
+            return stored
+        # The store only grows forward, so a longer period rewrites it.
+        # Symbols listed after start are complete from their first bar.
+        fetched = normalize_history(fetched)
+        bar_store.replace(symbol, '1d', fetched, first_available=source_first_bar(fetched, start))
+    elif bar_store.age(symbol, '1d') < HISTORY_REFRESH_SECONDS:
+        return stored
+    else:
+        # Re-fetch from the newest stored bar so a partial session is completed
+        fetched = fetch_history(symbol, start=stored.index[-1].strftime('%Y-%m-%d'))
+        if fetched.empty:
+            return stored
+        if has_corporate_actions(fetched, stored.index[-1]):
+            # The stored bars were adjusted before the dividend or split;
+            # rewrite them from a full download adjusted on the same basis
+            fetched = fetch_history(symbol, period=period)
+            if fetched.empty:
+                return stored
+            fetched = normalize_history(fetched)
+            bar_store.replace(symbol, '1d', fetched, first_available=source_first_bar(fetched, start))
+        else:
+            bar_store.append(symbol, '1d', normalize_history(fetched))
+    return bar_store.read(symbol, '1d', start=start)
+
+# Intraday periods served from intraday_bars, in regular sessions;
+# yfinance keeps 1m bars for 7 days
+INTRADAY_SESSIONS = {'1d': 1, '5d': 5, '1mo': 21}
+INTRADAY_INTERVAL_PERIODS = {
+    '1m': ['1d', '5d'],
+    '5m': ['1d', '5d', '1mo'],
+    '15m': ['1d', '5d', '1mo']
+}
+# Share of a window's expected bars that may be missing (halts, holidays,
+# minutes without trades) before the window is backfilled from yfinance
+INTRADAY_MISSING_TOLERANCE = 0.02
+# (symbol, interval) -> earliest bar of the last yfinance backfill; while
+# set, a window that is still short is served as stored
+intraday_backfills = TTLCache(maxsize=2048, ttl=HISTORY_REFRESH_SECONDS)
+
+def intraday_window(period, now):
+    """Start and end (exchange time) of the last INTRADAY_SESSIONS[period] sessions"""
+    day = now.normalize()
+    if day.weekday() >= 5 or now < day + SESSION_OPEN:
+        day -= pd.offsets.BDay(1)
+    days = pd.bdate_range(end=day, periods=INTRADAY_SESSIONS[period])
+    return days[0] + SESSION_OPEN, now
+
+def missing_intraday_bars(stored, start, end, interval):
+    """Regular-session bar times in [start, end) that are complete by end but not stored"""
+    step = pd.Timedelta(seconds=BAR_INTERVALS[interval])
+    days = pd.bdate_range(start.normalize(), end.normalize())
+    offsets = pd.timedelta_range(SESSION_OPEN, SESSION_CLOSE - step, freq=step)
+    expected = pd.DatetimeIndex((days.values[:, None] + offsets.values[None, :]).ravel())
+    expected = expected[(expected >= start) & (expected + step <= end)]
+    return expected.difference(stored.index), len(expected)
+
+def get_intraday_history(symbol, period='1d', interval='5m'):
+    """Get intraday bars from intraday_bars, backfilling from yfinance when they don't cover the period
+
+    The stored bars must include nearly every regular-session bar of the
+    window; otherwise the period is downloaded, stored and merged with
+    the stored bars. The ingestion daemon keeps intraday_bars current
+    from live trades, so a covered window needs no request to Yahoo.
+    """
+    if period not in INTRADAY_INTERVAL_PERIODS.get(interval, []):
+        raise ValueError(f"Unsupported intraday period {period} for {interval} bars")
+    start, end = intraday_window(period, pd.Timestamp.now(tz=MARKET_TZ).tz_localize(None))
+    backfilled_from = intraday_backfills.get((symbol, interval))
+    if backfilled_from is not None:
+        # Holidays leave the window short; serve what the last backfill returned
+        start = min(start, backfilled_from)
+    try:
+        stored = load_intraday_bars(symbol, interval, start)
+    except Exception as e:
+        print(f"Error loading intraday bars for {symbol}: {e}")
+        stored = pd.DataFrame(columns=HISTORY_COLUMNS)
+
+    missing, expected = missing_intraday_bars(stored, start, end, interval)
+    if backfilled_from is not None or len(missing) <= expected * INTRADAY_MISSING_TOLERANCE:
+        return stored
+
+    fetched = fetch_history(symbol, period=period, interval=interval)
+    if fetched.empty:
+        intraday_backfills.set((symbol, interval), start)
+        return stored
+    fetched = normalize_history(fetched)
+    intraday_backfills.set((symbol, interval), fetched.index[0])
+    store_intraday_frame(symbol, interval, fetched)
+    if stored.empty:
+        return fetched
+    # Downloaded bars win over stored ones for the same time
+    merged = pd.concat([stored, fetched])
+    return merged[~merged.index.duplicated(keep='last')].sort_index()
+
+def get_stock_data(symbol, period='1y', interval='1d'):
+    """Get stock data with error handling and validation
+
+    interval is '1d' for daily bars or one of '1m', '5m', '15m' for
+    intraday bars over an INTRADAY_INTERVAL_PERIODS period.
+    """
     if not is_valid_stock_symbol(symbol):
         return None, "Invalid stock symbol format"
 
     try:
-        stock = yf.Ticker(symbol)
-        hist = stock.history(period=period)
+        if interval == '1d':
+            hist = get_history(symbol, period)
+        else:
+            hist = get_intraday_history(symbol, period, interval)
         if hist.empty:
             return None, "No data available for this symbol"
 
         # Calculate technical indicators
         hist = calculate_technical_indicators(hist)
 
-        # Get real-time data if available
+        # Fold in the real-time quote if available
         rt_data = get_real_time_price(symbol)
         if rt_data:
-            current_time = datetime.now()
-            hist.loc[current_time] = {
-                'Open': rt_data['price'],
-                'High': rt_data['price'],
-                'Low': rt_data['price'],
-                'Close': rt_data['price'],
-                'Volume': rt_data['volume']
-            }
-            # Recalculate indicators with new data
-            hist = calculate_technical_indicators(hist)
+            hist = patch_live_bar(hist, rt_data, interval)
 
         return hist, None
     except Exception as e:
         print(f"Error fetching stock data: {e}")
         return None, f"Error fetching data: {str(e)}"
 
-def check_price_alerts(symbol, current_price):
-    """Check and update price alerts in database"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE price_alerts
-            SET is_triggered = TRUE, triggered_at = CURRENT_TIMESTAMP
-            WHERE symbol = %s AND 
-                  NOT is_triggered AND
-                  ((alert_type = 'above' AND %s > target_price) OR
-                   (alert_type = 'below' AND %s < target_price))
-            RETURNING id
-        ''', (symbol, current_price, current_price))
-        conn.commit()
+def live_bar_time(timestamp, interval):
+    """Start (naive exchange time) of the bar a local quote timestamp falls in, or None outside trading hours"""
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize(datetime.now().astimezone().tzinfo)
+    timestamp = timestamp.tz_convert(MARKET_TZ).tz_localize(None)
+    day = timestamp.normalize()
+    if day.weekday() >= 5:
+        return None
+    if interval == '1d':
+        # The closing print is stamped at the session close
+        return day if SESSION_OPEN <= timestamp - day <= SESSION_CLOSE else None
+    if not SESSION_OPEN <= timestamp - day < SESSION_CLOSE:
+        return None
+    return timestamp.floor(pd.Timedelta(seconds=BAR_INTERVALS[interval]))
+
+def live_candle(hist, rt_data, interval='1d'):
+    """Time and OHLCV of the bar a real-time quote moves, or None
+
+    A quote within the last bar moves its close and widens its high and
+    low; a later one starts a new bar. Quotes for earlier bars or outside
+    trading hours move nothing.
+    """
+    bar_time = live_bar_time(rt_data['timestamp'], interval)
+    if bar_time is None:
+        return None
+    if hist.index.tz is not None:
+        bar_time = bar_time.tz_localize(hist.index.tz)
+    if bar_time < hist.index[-1]:
+        return None
+
+    price = rt_data['price']
+    if bar_time == hist.index[-1]:
+        last = hist.iloc[-1]
+        return bar_time, {
+            'Open': last['Open'],
+            'High': max(last['High'], price),
+            'Low': min(last['Low'], price),
+            'Close': price,
+            'Volume': last['Volume']
+        }
+    # A quote's volume is its last minute's, so a new bar's is unknown
+    return bar_time, {'Open': price, 'High': price, 'Low': price, 'Close': price, 'Volume': 0}
+
+def patch_live_bar(hist, rt_data, interval='1d'):
+    """Fold a real-time quote into hist as live_candle does
+
+    The bar's indicators are updated incrementally from the rows before it.
+    """
+    candle = live_candle(hist, rt_data, interval)
+    if candle is None:
+        return hist
+    bar_time, bar = candle
+    if bar_time == hist.index[-1]:
+        hist = hist.iloc[:-1]
+    price = bar['Close']
+    bar.update(IndicatorState.from_frame(hist).peek(bar['High'], bar['Low'], price))
+    # Match the frame's columns and dtypes so a lean frame stays lean
+    bar = pd.DataFrame([bar], index=pd.DatetimeIndex([bar_time], name=hist.index.name)).reindex(columns=hist.columns)
+    return pd.concat([hist, bar.astype(hist.dtypes.to_dict())])
 
 def set_price_alert(user_id, symbol, price, alert_type='above'):
-    """Set price alert in database"""
+    """Set price alert in database; returns the new alert id, or None on failure"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         try:
@@ -234,12 +711,16 @@ def set_price_alert(user_id, symbol, price, alert_type='above'):
                 INSERT INTO price_alerts 
                 (user_id, symbol, target_price, alert_type)
                 VALUES (%s, %s, %s, %s)
+                RETURNING id
             ''', (user_id, symbol, price, alert_type))
+            alert_id = cursor.fetchone()[0]
+            # Delivered to the ingestion daemon when the insert commits
+            cursor.execute('SELECT pg_notify(%s, %s)', (ALERT_CHANNEL, str(alert_id)))
             conn.commit()
-            return True
+            return alert_id
         except Exception as e:
             print(f"Error setting price alert: {e}")
-            return False
+            return None
 
 def get_price_alerts(user_id, symbol):
     """Get price alerts from database"""
@@ -261,49 +742,176 @@ def get_price_alerts(user_id, symbol):
             })
         return alerts
 
-def calculate_volume_profile(data):
-    """Calculate volume profile analysis"""
-    price_bins = np.linspace(data['Low'].min(), data['High'].max(), 20)
-    volume_profile = np.zeros_like(price_bins)
+def calculate_volume_profile(data, bins=20, tick_size=None, weight_by_range=False):
+    """Calculate volume profile analysis in a single histogram pass
+
+    Bins are either `bins` equal-width buckets between the lowest low and
+    highest high, or fixed `tick_size` price steps. By default each bar's
+    volume is bucketed at its close; with weight_by_range it is spread
+    evenly across the bar's High-Low range. Returns the bin edges
+    (n + 1 values) and the volume in each bin (n values).
+    """
+    frame = data[['Low', 'High', 'Close', 'Volume']].dropna()
+    low = frame['Low'].to_numpy(dtype='float64')
+    high = frame['High'].to_numpy(dtype='float64')
+    close = frame['Close'].to_numpy(dtype='float64')
+    volume = frame['Volume'].to_numpy(dtype='float64')
+    if len(close) == 0:
+        return np.zeros(bins + 1), np.zeros(bins)
 
-    for i in range(len(price_bins)-1):
-        mask = (data['Close'] >= price_bins[i]) & (data['Close'] < price_bins[i+1])
-        volume_profile[i] = data.loc[mask, 'Volume'].sum()
+    price_min, price_max = low.min(), high.max()
+    if tick_size:
+        first = np.floor(price_min / tick_size) * tick_size
+        count = max(int(np.ceil((price_max - first) / tick_size)), 1)
+        price_bins = first + tick_size * np.arange(count + 1)
+    else:
+        if price_max <= price_min:
+            price_max = price_min + max(abs(price_min) * 1e-6, 1e-6)
+        price_bins = np.linspace(price_min, price_max, bins + 1)
 
-    return price_bins, volume_profile
+    if not weight_by_range:
+        # np.histogram closes the last bin, so the highest price is counted
+        volume_profile, _ = np.histogram(close, bins=price_bins, weights=volume)
+        return price_bins, volume_profile
+
+    return price_bins, _range_weighted_profile(low, high, close, volume, price_bins)
+
+def _range_weighted_profile(low, high, close, volume, price_bins):
+    """Spread each bar's volume uniformly over [Low, High]
+
+    Uses the cumulative volume function F(x) of all bars, evaluated at the
+    bin edges with sorted prefix sums, so the cost is O(N log N + bins).
+    """
+    flat = high <= low
+    volume_profile, _ = np.histogram(close[flat], bins=price_bins, weights=volume[flat])
+    volume_profile = volume_profile.astype('float64')
+
+    low, high, volume = low[~flat], high[~flat], volume[~flat]
+    if len(volume) == 0:
+        return volume_profile
+    density = volume / (high - low)
+
+    # F(x) = sum over bars with L <= x of d * (x - L) minus the same over H <= x
+    cumulative = np.zeros(len(price_bins))
+    for bound, sign in ((low, 1.0), (high, -1.0)):
+        order = np.argsort(bound)
+        sorted_bound = bound[order]
+        sorted_density = density[order]
+        density_sum = np.concatenate(([0.0], np.cumsum(sorted_density)))
+        moment_sum = np.concatenate(([0.0], np.cumsum(sorted_density * sorted_bound)))
+        idx = np.searchsorted(sorted_bound, price_bins, side='right')
+        cumulative += sign * (price_bins * density_sum[idx] - moment_sum[idx])
+
+    volume_profile += np.clip(np.diff(cumulative), 0, None)
+    return volume_profile
+
+def calculate_value_area(price_bins, volume_profile, value_area_pct=0.7):
+    """Find the point of control and the value area around it
+
+    Starting at the highest-volume bin, the neighbouring bin with more
+    volume is added until value_area_pct of total volume is covered.
+    """
+    volume_profile = np.asarray(volume_profile, dtype='float64')
+    total = volume_profile.sum()
+    centers = (price_bins[:-1] + price_bins[1:]) / 2
+    poc = int(np.argmax(volume_profile))
+    if total <= 0:
+        return {'poc': centers[poc], 'value_area_high': price_bins[-1], 'value_area_low': price_bins[0]}
+
+    lo = hi = poc
+    covered = volume_profile[poc]
+    target = total * value_area_pct
+    while covered < target and (lo > 0 or hi < len(volume_profile) - 1):
+        below = volume_profile[lo - 1] if lo > 0 else -1.0
+        above = volume_profile[hi + 1] if hi < len(volume_profile) - 1 else -1.0
+        if above >= below:
+            hi += 1
+            covered += above
+        else:
+            lo -= 1
+            covered += below
+
+    return {
+        'poc': centers[poc],
+        'value_area_high': price_bins[hi + 1],
+        'value_area_low': price_bins[lo]
+    }
+
+# float32 prices and indicators, integer volume and no duplicated indicator
+# columns (BB_middle is left out; it equals SMA_20)
+LEAN_FRAMES = os.getenv('LEAN_FRAMES', '').lower() in ('1', 'true', 'yes')
+
+def compact_frame(data):
+    """Downcast float columns to float32 and volume to int64"""
+    dtypes = {column: 'float32' for column, dtype in data.dtypes.items() if dtype == 'float64'}
+    if 'Volume' in data.columns:
+        dtypes['Volume'] = 'int64'
+        if data['Volume'].isna().any():
+            data = data.assign(Volume=data['Volume'].fillna(0))
+    return data.astype(dtypes)
+
+def frame_memory_usage(data):
+    """Bytes used by a frame's index and each of its columns"""
+    usage = data.memory_usage(index=True, deep=True)
+    return {
+        'total_bytes': int(usage.sum()),
+        'index_bytes': int(usage['Index']),
+        'columns': {column: int(usage[column]) for column in data.columns}
+    }
+
+def calculate_technical_indicators(data, lean=None):
+    """Calculate comprehensive technical indicators
+
+    In lean mode (LEAN_FRAMES, or lean=True) the input is compacted with
+    compact_frame first and each indicator is stored as float32 as it is
+    added, so the frame never holds float64 indicator columns. Lean frames
+    have no BB_middle column; use SMA_20 instead.
+    """
+    lean = LEAN_FRAMES if lean is None else lean
+    if lean:
+        data = compact_frame(data)
+
+    def store(column, values):
+        data[column] = values.astype('float32') if lean else values
 
-def calculate_technical_indicators(data):
-    """Calculate comprehensive technical indicators"""
     # RSI
     delta = data['Close'].diff()
     gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
     loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
     rs = gain / loss
-    data['RSI'] = 100 - (100 / (1 + rs))
+    store('RSI', 100 - (100 / (1 + rs)))
 
     # Moving Averages
-    data['SMA_20'] = data['Close'].rolling(window=20).mean()
-    data['SMA_50'] = data['Close'].rolling(window=50).mean()
-    data['SMA_200'] = data['Close'].rolling(window=200).mean()
-    data['EMA_12'] = data['Close'].ewm(span=12, adjust=False).mean()
-    data['EMA_26'] = data['Close'].ewm(span=26, adjust=False).mean()
+    rolling_20 = data['Close'].rolling(window=20)
+    sma_20 = rolling_20.mean()
+    store('SMA_20', sma_20)
+    store('SMA_50', data['Close'].rolling(window=50).mean())
+    store('SMA_200', data['Close'].rolling(window=200).mean())
+    ema_12 = data['Close'].ewm(span=12, adjust=False).mean()
+    ema_26 = data['Close'].ewm(span=26, adjust=False).mean()
+    store('EMA_12', ema_12)
+    store('EMA_26', ema_26)
 
     # MACD
-    data['MACD'] = data['EMA_12'] - data['EMA_26']
-    data['Signal'] = data['MACD'].ewm(span=9, adjust=False).mean()
-    data['MACD_Histogram'] = data['MACD'] - data['Signal']
+    macd = ema_12 - ema_26
+    signal = macd.ewm(span=9, adjust=False).mean()
+    store('MACD', macd)
+    store('Signal', signal)
+    store('MACD_Histogram', macd - signal)
 
-    # Bollinger Bands
-    data['BB_middle'] = data['Close'].rolling(window=20).mean()
-    data['BB_upper'] = data['BB_middle'] + 2 * data['Close'].rolling(window=20).std()
-    data['BB_lower'] = data['BB_middle'] - 2 * data['Close'].rolling(window=20).std()
+    # Bollinger Bands around the 20-bar SMA
+    std_20 = rolling_20.std()
+    if not lean:
+        data['BB_middle'] = data['SMA_20']
+    store('BB_upper', sma_20 + 2 * std_20)
+    store('BB_lower', sma_20 - 2 * std_20)
 
     # Stochastic Oscillator
     low_min = data['Low'].rolling(14).min()
     high_max = data['High'].rolling(14).max()
-    data['%K'] = 100 * (data['Close'] - low_min) / (high_max - low_min)
-    data['%D'] = data['%K'].rolling(3).mean()
-
+    percent_k = 100 * (data['Close'] - low_min) / (high_max - low_min)
+    store('%K', percent_k)
+    store('%D', percent_k.rolling(3).mean())
     return data
 
 def add_to_watchlist(user_id, symbol):
@@ -349,33 +957,30 @@ def get_portfolio(user_id):
         ''', (user_id,))
         return cursor.fetchall()
 
-def calculate_portfolio_metrics(portfolio_data):
-    total_value = 0
-    total_cost = 0
-    portfolio_items = []
-
-    for symbol, shares, purchase_price, purchase_date in portfolio_data:
-        info = get_stock_info(symbol)
-        if info:
-            current_price = info['price']
-            current_value = shares * current_price
-            cost_basis = shares * purchase_price
-            gain_loss = current_value - cost_basis
-            gain_loss_pct = (gain_loss / cost_basis) * 100 if cost_basis > 0 else 0
-
-            total_value += current_value
-            total_cost += cost_basis
-
-            portfolio_items.append({
-                'Symbol': symbol,
-                'Shares': shares,
-                'Purchase Price': f"${purchase_price:.2f}",
-                'Current Price': f"${current_price:.2f}",
-                'Total Value': f"${current_value:.2f}",
-                'Gain/Loss': f"${gain_loss:.2f}",
-                'Gain/Loss %': f"{gain_loss_pct:.2f}%"
-            })
+PORTFOLIO_COLUMNS = ['Symbol', 'Shares', 'Purchase Price', 'Purchase Date']
+
+def value_portfolio(portfolio_data, prices):
+    """Value portfolio lots against a {symbol: price} mapping using column operations"""
+    lots = pd.DataFrame(list(portfolio_data), columns=PORTFOLIO_COLUMNS)
+    lots['Shares'] = lots['Shares'].astype('float64')
+    lots['Purchase Price'] = lots['Purchase Price'].astype('float64')
+    lots['Current Price'] = lots['Symbol'].map(prices).astype('float64')
+    lots = lots.dropna(subset=['Current Price']).reset_index(drop=True)
 
+    shares = lots['Shares'].to_numpy()
+    current_value = shares * lots['Current Price'].to_numpy()
+    cost_basis = shares * lots['Purchase Price'].to_numpy()
+    gain_loss = current_value - cost_basis
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gain_loss_pct = np.where(cost_basis > 0, gain_loss / cost_basis * 100, 0.0)
+
+    lots['Total Value'] = current_value
+    lots['Cost Basis'] = cost_basis
+    lots['Gain/Loss'] = gain_loss
+    lots['Gain/Loss %'] = gain_loss_pct
+
+    total_value = float(current_value.sum())
+    total_cost = float(cost_basis.sum())
     portfolio_summary = {
         'total_value': total_value,
         'total_cost': total_cost,
@@ -383,40 +988,234 @@ def calculate_portfolio_metrics(portfolio_data):
         'total_gain_loss_pct': ((total_value - total_cost) / total_cost * 100) if total_cost > 0 else 0
     }
 
-    return portfolio_items, portfolio_summary
+    return lots, portfolio_summary
 
-def get_stock_info(symbol):
-    try:
-        stock = yf.Ticker(symbol)
-        info = stock.info
+def calculate_portfolio_metrics(portfolio_data):
+    """Price all distinct portfolio symbols in one pass and value every lot"""
+    symbols = {row[0] for row in portfolio_data}
+    quotes = get_real_time_prices(symbols)
+    prices = {symbol: quote['price'] for symbol, quote in quotes.items()}
+    return value_portfolio(portfolio_data, prices)
 
-        # Get real-time price if available
-        rt_data = get_real_time_price(symbol)
-        current_price = rt_data['price'] if rt_data else info.get('currentPrice', 0)
-
-        return {
-            'name': info.get('longName', 'N/A'),
-            'sector': info.get('sector', 'N/A'),
-            'industry': info.get('industry', 'N/A'),
-            'price': current_price,
-            'change': info.get('regularMarketChangePercent', 0),
-            'volume': info.get('volume', 0),
-            'avg_volume': info.get('averageVolume', 0),
-            'market_cap': info.get('marketCap', 0),
-            'pe_ratio': info.get('trailingPE', 'N/A'),
-            'forward_pe': info.get('forwardPE', 'N/A'),
-            'dividend_yield': info.get('dividendYield', 'N/A'),
-            'beta': info.get('beta', 'N/A'),
-            '52w_high': info.get('fiftyTwoWeekHigh', 'N/A'),
-            '52w_low': info.get('fiftyTwoWeekLow', 'N/A'),
-            'description': info.get('longBusinessSummary', 'N/A')
-        }
+def format_portfolio_table(portfolio_items):
+    """Format valued portfolio lots for display"""
+    table = portfolio_items[['Symbol', 'Shares']].copy()
+    for column in ['Purchase Price', 'Current Price', 'Total Value', 'Gain/Loss']:
+        table[column] = portfolio_items[column].map('${:,.2f}'.format)
+    table['Gain/Loss %'] = portfolio_items['Gain/Loss %'].map('{:.2f}%'.format)
+    return table
+
+# Fundamentals snapshot settings
+FUNDAMENTALS_TTL_HOURS = float(os.getenv('FUNDAMENTALS_TTL_HOURS', '24'))
+FUNDAMENTALS_REFRESH_WORKERS = int(os.getenv('FUNDAMENTALS_REFRESH_WORKERS', '2'))
+
+# (stock_fundamentals column, yfinance info key, default when missing)
+FUNDAMENTAL_FIELDS = [
+    ('name', 'longName', 'N/A'),
+    ('sector', 'sector', 'N/A'),
+    ('industry', 'industry', 'N/A'),
+    ('description', 'longBusinessSummary', 'N/A'),
+    ('market_cap', 'marketCap', 0),
+    ('pe_ratio', 'trailingPE', 'N/A'),
+    ('forward_pe', 'forwardPE', 'N/A'),
+    ('dividend_yield', 'dividendYield', 'N/A'),
+    ('beta', 'beta', 'N/A'),
+    ('week52_high', 'fiftyTwoWeekHigh', 'N/A'),
+    ('week52_low', 'fiftyTwoWeekLow', 'N/A'),
+    ('volume', 'volume', 0),
+    ('avg_volume', 'averageVolume', 0),
+    ('previous_close', 'previousClose', None),
+    ('last_price', 'currentPrice', None)
+]
+FUNDAMENTAL_COLUMNS = [column for column, _, _ in FUNDAMENTAL_FIELDS]
+# Ticker.info keys used when the primary key is missing; ETFs and
+# indices have no currentPrice
+FUNDAMENTAL_FALLBACKS = {
+    'previous_close': 'regularMarketPreviousClose',
+    'last_price': 'regularMarketPrice'
+}
+
+_fundamentals_executor = ThreadPoolExecutor(max_workers=FUNDAMENTALS_REFRESH_WORKERS)
+_fundamentals_inflight = set()
+_fundamentals_lock = threading.Lock()
+
+def fetch_fundamentals(symbol):
+    """Download the fundamental fields of Ticker.info for a symbol"""
+    with yfinance_call('info'):
+        info = yf.Ticker(symbol).info
+    fundamentals = {column: info.get(key) for column, key, _ in FUNDAMENTAL_FIELDS}
+    for column, key in FUNDAMENTAL_FALLBACKS.items():
+        if fundamentals[column] is None:
+            fundamentals[column] = info.get(key)
+    return fundamentals
+
+def store_fundamentals(symbol, fundamentals):
+    """Upsert a fundamentals snapshot"""
+    columns = ', '.join(FUNDAMENTAL_COLUMNS)
+    updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in FUNDAMENTAL_COLUMNS)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            INSERT INTO stock_fundamentals (symbol, {columns})
+            VALUES (%s, {', '.join(['%s'] * len(FUNDAMENTAL_COLUMNS))})
+            ON CONFLICT (symbol)
+            DO UPDATE SET {updates}, updated_at = CURRENT_TIMESTAMP
+        ''', [symbol] + [fundamentals[column] for column in FUNDAMENTAL_COLUMNS])
+        conn.commit()
+
+def load_fundamentals(symbols):
+    """Load fundamentals snapshots as {symbol: (fundamentals, age in hours)}"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT symbol, {', '.join(FUNDAMENTAL_COLUMNS)},
+                   EXTRACT(EPOCH FROM (NOW() - updated_at)) / 3600
+            FROM stock_fundamentals
+            WHERE symbol = ANY(%s)
+        ''', (list(symbols),))
+        snapshots = {}
+        for row in cursor.fetchall():
+            fundamentals = dict(zip(FUNDAMENTAL_COLUMNS, row[1:-1]))
+            snapshots[row[0]] = (fundamentals, float(row[-1]))
+        return snapshots
+
+def refresh_fundamentals(symbol):
+    """Fetch and store a fresh fundamentals snapshot"""
+    try:
+        fundamentals = fetch_fundamentals(symbol)
+        store_fundamentals(symbol, fundamentals)
+        return fundamentals
     except Exception as e:
-        print(f"Error fetching stock info: {e}")
+        print(f"Error refreshing fundamentals for {symbol}: {e}")
         return None
+    finally:
+        with _fundamentals_lock:
+            _fundamentals_inflight.discard(symbol)
+
+def schedule_fundamentals_refresh(symbol):
+    """Refresh a stale snapshot in the background, once per symbol at a time"""
+    with _fundamentals_lock:
+        if symbol in _fundamentals_inflight:
+            return
+        _fundamentals_inflight.add(symbol)
+    _fundamentals_executor.submit(refresh_fundamentals, symbol)
+
+def _build_stock_info(fundamentals, rt_data):
+    info = {
+        column: default if fundamentals.get(column) is None else fundamentals[column]
+        for column, _, default in FUNDAMENTAL_FIELDS
+    }
+    for column in ['market_cap', 'pe_ratio', 'forward_pe', 'dividend_yield', 'beta',
+                   'week52_high', 'week52_low', 'previous_close', 'last_price']:
+        if isinstance(info[column], Decimal):
+            info[column] = float(info[column])
+
+    # Fall back to the previous close; price and change are None when
+    # neither is known rather than a 0 price and a -100% change
+    previous_close = info['previous_close']
+    current_price = info['last_price'] or previous_close or None
+    if current_price is None:
+        change = None
+    else:
+        change = (current_price - previous_close) / previous_close * 100 if previous_close else 0
+
+    return apply_quote({
+        'name': info['name'],
+        'sector': info['sector'],
+        'industry': info['industry'],
+        'price': current_price,
+        'change': change,
+        'previous_close': previous_close,
+        'quote_time': None,
+        'volume': info['volume'],
+        'avg_volume': info['avg_volume'],
+        'market_cap': info['market_cap'],
+        'pe_ratio': info['pe_ratio'],
+        'forward_pe': info['forward_pe'],
+        'dividend_yield': info['dividend_yield'],
+        'beta': info['beta'],
+        '52w_high': info['week52_high'],
+        '52w_low': info['week52_low'],
+        'description': info['description']
+    }, rt_data)
+
+def apply_quote(info, rt_data):
+    """Stock info with its price, change and quote time taken from a real-time quote"""
+    if not rt_data:
+        return info
+    price = rt_data['price']
+    previous_close = info['previous_close']
+    return dict(
+        info,
+        price=price,
+        change=(price - previous_close) / previous_close * 100 if previous_close else 0,
+        quote_time=rt_data['timestamp']
+    )
+
+def get_stock_infos(symbols):
+    """Get stock info for several symbols from fundamentals snapshots and live prices
+
+    Snapshots older than FUNDAMENTALS_TTL_HOURS are served as-is and
+    refreshed in the background; only symbols never seen before are
+    downloaded inline.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    try:
+        snapshots = load_fundamentals(symbols)
+    except Exception as e:
+        print(f"Error loading fundamentals: {e}")
+        snapshots = {}
+
+    fundamentals = {}
+    for symbol in symbols:
+        if symbol in snapshots:
+            fundamentals[symbol], age = snapshots[symbol]
+            if age > FUNDAMENTALS_TTL_HOURS:
+                schedule_fundamentals_refresh(symbol)
+            continue
+        try:
+            fundamentals[symbol] = fetch_fundamentals(symbol)
+            store_fundamentals(symbol, fundamentals[symbol])
+        except Exception as e:
+            print(f"Error fetching stock info for {symbol}: {e}")
+
+    prices = get_real_time_prices(fundamentals.keys())
+    return {
+        symbol: _build_stock_info(fundamentals[symbol], prices.get(symbol))
+        for symbol in symbols if symbol in fundamentals
+    }
+
+def get_stock_info(symbol):
+    """Get stock info for a single symbol"""
+    return get_stock_infos([symbol]).get(symbol)
+
+# Built technical analysis figures keyed by (symbol, period), each stored
+# with the signature of the data it was built from
+FIGURE_CACHE_TTL = float(os.getenv('FIGURE_CACHE_TTL', '600'))
+FIGURE_CACHE_SIZE = int(os.getenv('FIGURE_CACHE_SIZE', '256'))
+figure_cache = TTLCache(maxsize=FIGURE_CACHE_SIZE, ttl=FIGURE_CACHE_TTL)
+
+def render_technical_indicators(data, symbol=None, period=None):
+    """Render comprehensive technical analysis visualization
+
+    When symbol is given the built figure is cached, so reruns over
+    unchanged data reuse it instead of rebuilding all three panels. The
+    cached figure is only reused if the bar count and the whole last bar
+    match, since the last bar changes while its session is in progress.
+    """
+    cache_key = None
+    if symbol is not None and len(data):
+        cache_key = (symbol, period)
+        signature = (len(data), data.index[-1], tuple(data[HISTORY_COLUMNS].iloc[-1].tolist()))
+        cached = figure_cache.get(cache_key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    candles = downsample_ohlc(data)
+    x = candles.index
+    opens = candles['Open'].to_numpy()
+    closes = candles['Close'].to_numpy()
 
-def render_technical_indicators(data):
-    """Render comprehensive technical analysis visualization"""
     fig = make_subplots(
         rows=3, cols=1,
         shared_xaxes=True,
@@ -427,11 +1226,11 @@ def render_technical_indicators(data):
     # Price and Indicators
     fig.add_trace(
         go.Candlestick(
-            x=data.index,
-            open=data['Open'],
-            high=data['High'],
-            low=data['Low'],
-            close=data['Close'],
+            x=x,
+            open=opens,
+            high=candles['High'].to_numpy(),
+            low=candles['Low'].to_numpy(),
+            close=closes,
             name='OHLC'
         ),
         row=1, col=1
@@ -439,18 +1238,16 @@ def render_technical_indicators(data):
 
     # Add Stochastic
     fig.add_trace(
-        go.Scatter(
-            x=data.index,
-            y=data['%K'],
+        reduced_line_trace(
+            data['%K'],
             name='%K',
             line=dict(color='blue')
         ),
         row=2, col=1
     )
     fig.add_trace(
-        go.Scatter(
-            x=data.index,
-            y=data['%D'],
+        reduced_line_trace(
+            data['%D'],
             name='%D',
             line=dict(color='orange')
         ),
@@ -458,12 +1255,11 @@ def render_technical_indicators(data):
     )
 
     # Add Volume
-    colors = ['red' if row['Open'] - row['Close'] >= 0 
-              else 'green' for index, row in data.iterrows()]
+    colors = np.where(opens - closes >= 0, 'red', 'green')
     fig.add_trace(
         go.Bar(
-            x=data.index,
-            y=data['Volume'],
+            x=x,
+            y=candles['Volume'].to_numpy(),
             name='Volume',
             marker_color=colors
         ),
@@ -480,6 +1276,6 @@ def render_technical_indicators(data):
         height=800
     )
 
+    if cache_key is not None:
+        figure_cache.set(cache_key, (signature, fig))
     return fig
-
-start_price_updates()
\ No newline at end of file
@@ -0,0 +1,218 @@
+from collections import deque
+from itertools import islice
+import math
+
+SMA_WINDOWS = (20, 50, 200)
+RSI_WINDOW = 14
+STOCH_WINDOW = 14
+STOCH_SMOOTHING = 3
+BB_WINDOW = 20
+
+# Running sums are rebuilt from the window buffers this often to stop
+# floating point drift on long-lived streams
+RESYNC_INTERVAL = 10000
+
+NAN = float('nan')
+
+def _ema_alpha(span):
+    return 2.0 / (span + 1.0)
+
+class IndicatorState:
+    """Incremental technical indicator state for a single symbol.
+
+    Produces the same columns as stock_utils.calculate_technical_indicators,
+    updated in constant time per bar instead of recomputing full history.
+    Use push_bar() for completed bars and peek() for a live tick on the bar
+    that is still forming.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.values = {}
+        self._closes = deque(maxlen=max(SMA_WINDOWS))
+        self._sums = {w: 0.0 for w in SMA_WINDOWS}
+        self._sumsq = 0.0
+        self._gains = deque(maxlen=RSI_WINDOW)
+        self._losses = deque(maxlen=RSI_WINDOW)
+        self._gain_sum = 0.0
+        self._loss_sum = 0.0
+        self._highs = deque(maxlen=STOCH_WINDOW)
+        self._lows = deque(maxlen=STOCH_WINDOW)
+        self._ks = deque(maxlen=STOCH_SMOOTHING - 1)
+        self._ema12 = None
+        self._ema26 = None
+        self._signal = None
+
+    @classmethod
+    def from_frame(cls, data):
+        """Seed state from a frame already processed by calculate_technical_indicators"""
+        state = cls()
+        if data is None or data.empty:
+            return state
+
+        closes = data['Close'].to_numpy(dtype=float)
+        state.count = len(closes)
+        state._closes.extend(closes[-max(SMA_WINDOWS):])
+        state._resync()
+
+        # The first bar has no delta and counts as a zero gain and loss,
+        # matching delta.where(...) filling NaN with 0 in the batch version
+        tail = closes[-(RSI_WINDOW + 1):]
+        deltas = [b - a for a, b in zip(tail[:-1], tail[1:])]
+        if len(closes) <= RSI_WINDOW:
+            deltas.insert(0, 0.0)
+        state._gains.extend(max(d, 0.0) for d in deltas)
+        state._losses.extend(max(-d, 0.0) for d in deltas)
+        state._gain_sum = sum(state._gains)
+        state._loss_sum = sum(state._losses)
+
+        state._highs.extend(data['High'].to_numpy(dtype=float)[-STOCH_WINDOW:])
+        state._lows.extend(data['Low'].to_numpy(dtype=float)[-STOCH_WINDOW:])
+
+        if {'EMA_12', 'EMA_26', 'Signal'}.issubset(data.columns):
+            state._ema12 = float(data['EMA_12'].iloc[-1])
+            state._ema26 = float(data['EMA_26'].iloc[-1])
+            state._signal = float(data['Signal'].iloc[-1])
+        else:
+            ema12 = data['Close'].ewm(span=12, adjust=False).mean()
+            ema26 = data['Close'].ewm(span=26, adjust=False).mean()
+            state._ema12 = float(ema12.iloc[-1])
+            state._ema26 = float(ema26.iloc[-1])
+            state._signal = float((ema12 - ema26).ewm(span=9, adjust=False).mean().iloc[-1])
+
+        if '%K' in data.columns:
+            state._ks.extend(data['%K'].to_numpy(dtype=float)[-(STOCH_SMOOTHING - 1):])
+        else:
+            for i in range(min(len(closes), STOCH_SMOOTHING - 1), 0, -1):
+                end = len(closes) - i + 1
+                if end < STOCH_WINDOW:
+                    state._ks.append(NAN)
+                    continue
+                high_max = data['High'].iloc[end - STOCH_WINDOW:end].max()
+                low_min = data['Low'].iloc[end - STOCH_WINDOW:end].min()
+                state._ks.append(_stochastic_k(closes[end - 1], low_min, high_max))
+
+        state.values = {
+            col: float(data[col].iloc[-1])
+            for col in INDICATOR_COLUMNS if col in data.columns
+        }
+        return state
+
+    def push_bar(self, high, low, close):
+        """Add a completed bar and return the indicator values for it"""
+        self.values = self._step(float(high), float(low), float(close), commit=True)
+        return self.values
+
+    def peek(self, high, low, close):
+        """Indicator values if the given bar were added, without changing state"""
+        return self._step(float(high), float(low), float(close), commit=False)
+
+    def _step(self, high, low, close, commit):
+        n = self.count + 1
+        closes = self._closes
+
+        # Simple moving averages over running window sums
+        sums = {}
+        for window in SMA_WINDOWS:
+            total = self._sums[window] + close
+            if len(closes) >= window:
+                total -= closes[-window]
+            sums[window] = total
+        sumsq = self._sumsq + close * close
+        if len(closes) >= BB_WINDOW:
+            sumsq -= closes[-BB_WINDOW] ** 2
+
+        # RSI from rolling average gain and loss
+        delta = close - closes[-1] if closes else 0.0
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        gain_sum = self._gain_sum + gain
+        loss_sum = self._loss_sum + loss
+        if len(self._gains) == RSI_WINDOW:
+            gain_sum -= self._gains[0]
+            loss_sum -= self._losses[0]
+
+        # Exponential moving averages and MACD
+        if self._ema12 is None:
+            ema12 = ema26 = close
+        else:
+            ema12 = self._ema12 + _ema_alpha(12) * (close - self._ema12)
+            ema26 = self._ema26 + _ema_alpha(26) * (close - self._ema26)
+        macd = ema12 - ema26
+        if self._signal is None:
+            signal = macd
+        else:
+            signal = self._signal + _ema_alpha(9) * (macd - self._signal)
+
+        # Stochastic oscillator over the last STOCH_WINDOW bars
+        skip = 1 if len(self._highs) == STOCH_WINDOW else 0
+        high_max = max(high, *islice(self._highs, skip, None)) if self._highs else high
+        low_min = min(low, *islice(self._lows, skip, None)) if self._lows else low
+        k = _stochastic_k(close, low_min, high_max) if n >= STOCH_WINDOW else NAN
+        recent_ks = list(self._ks) + [k]
+        if len(recent_ks) == STOCH_SMOOTHING and not any(math.isnan(x) for x in recent_ks):
+            d = sum(recent_ks) / STOCH_SMOOTHING
+        else:
+            d = NAN
+
+        values = {}
+        for window in SMA_WINDOWS:
+            values[f'SMA_{window}'] = sums[window] / window if n >= window else NAN
+        values['RSI'] = _rsi(gain_sum, loss_sum) if n >= RSI_WINDOW else NAN
+        values['EMA_12'] = ema12
+        values['EMA_26'] = ema26
+        values['MACD'] = macd
+        values['Signal'] = signal
+        values['MACD_Histogram'] = macd - signal
+        if n >= BB_WINDOW:
+            mean = sums[BB_WINDOW] / BB_WINDOW
+            variance = max((sumsq - BB_WINDOW * mean * mean) / (BB_WINDOW - 1), 0.0)
+            std = math.sqrt(variance)
+            values['BB_middle'] = mean
+            values['BB_upper'] = mean + 2 * std
+            values['BB_lower'] = mean - 2 * std
+        else:
+            values['BB_middle'] = values['BB_upper'] = values['BB_lower'] = NAN
+        values['%K'] = k
+        values['%D'] = d
+
+        if commit:
+            closes.append(close)
+            self._sums = sums
+            self._sumsq = sumsq
+            self._gains.append(gain)
+            self._losses.append(loss)
+            self._gain_sum = gain_sum
+            self._loss_sum = loss_sum
+            self._ema12, self._ema26, self._signal = ema12, ema26, signal
+            self._highs.append(high)
+            self._lows.append(low)
+            self._ks.append(k)
+            self.count = n
+            if n % RESYNC_INTERVAL == 0:
+                self._resync()
+        return values
+
+    def _resync(self):
+        closes = list(self._closes)
+        for window in SMA_WINDOWS:
+            self._sums[window] = sum(closes[-window:])
+        self._sumsq = sum(c * c for c in closes[-BB_WINDOW:])
+        self._gain_sum = sum(self._gains)
+        self._loss_sum = sum(self._losses)
+
+INDICATOR_COLUMNS = (
+    'RSI', 'SMA_20', 'SMA_50', 'SMA_200', 'EMA_12', 'EMA_26',
+    'MACD', 'Signal', 'MACD_Histogram', 'BB_middle', 'BB_upper',
+    'BB_lower', '%K', '%D'
+)
+
+def _rsi(gain_sum, loss_sum):
+    if loss_sum == 0:
+        return 100.0 if gain_sum > 0 else NAN
+    rs = gain_sum / loss_sum
+    return 100 - (100 / (1 + rs))
+
+def _stochastic_k(close, low_min, high_max):
+    if high_max == low_min:
+        return NAN
+    return 100 * (close - low_min) / (high_max - low_min)
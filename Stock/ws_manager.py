@@ -0,0 +1,112 @@
+import asyncio
+import json
+import random
+import time
+import websockets
+
+def parse_quote_message(message):
+    """Parse a websocket quote message into (symbol, price, volume, sent_at) tuples
+
+    sent_at is the feed's epoch send time in 't' when present (the market
+    simulator sets it), otherwise None.
+    """
+    data = json.loads(message)
+    return [
+        (quote['s'], float(quote['p']), int(quote.get('v', 0)),
+         quote['t'] if isinstance(quote.get('t'), (int, float)) else None)
+        for quote in data.get('data', [])
+    ]
+
+class WebSocketManager:
+    """Quote websocket connection with targeted subscriptions.
+
+    Subscribes only to the symbols it is given, and sends subscribe and
+    unsubscribe messages as that set changes. It reconnects with jittered
+    exponential backoff and restores the full subscription after every
+    reconnect. The backoff only resets once a connection has delivered a
+    message or stayed open for stable_after seconds, so a server that
+    accepts and then drops connections is not retried in a tight loop.
+    Quotes are passed to the async on_quote(symbol, price, volume,
+    sent_at) callback.
+    """
+
+    def __init__(self, url, on_quote, symbols=(), base_delay=1.0, max_delay=60.0, stable_after=30.0):
+        self.url = url
+        self.on_quote = on_quote
+        self.symbols = set(symbols)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stable_after = stable_after
+        self._ws = None
+        self._received = False
+        self._lock = asyncio.Lock()
+        self.stats = {'connects': 0, 'disconnects': 0, 'messages': 0, 'retry_attempt': 0}
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff for the given failed attempt count"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def _send(self, action, symbols):
+        if self._ws is not None and symbols:
+            await self._ws.send(json.dumps({"type": action, "symbols": sorted(symbols)}))
+
+    async def set_symbols(self, symbols):
+        """Replace the tracked symbol set, updating a live subscription in place"""
+        symbols = set(symbols)
+        async with self._lock:
+            added = symbols - self.symbols
+            removed = self.symbols - symbols
+            self.symbols = symbols
+            try:
+                await self._send("subscribe", added)
+                await self._send("unsubscribe", removed)
+            except websockets.ConnectionClosed:
+                # The reconnect path subscribes to the full set again
+                pass
+
+    async def run(self, stopping):
+        """Keep a connection open until the stopping event is set or the task is cancelled"""
+        attempt = 0
+        while not stopping.is_set():
+            connected_at = None
+            self._received = False
+            try:
+                async with websockets.connect(self.url) as ws:
+                    async with self._lock:
+                        self._ws = ws
+                        await self._send("subscribe", self.symbols)
+                    self.stats['connects'] += 1
+                    connected_at = time.monotonic()
+                    await self._consume(ws)
+            except (OSError, websockets.WebSocketException) as e:
+                print(f"WebSocket error: {e}")
+            finally:
+                self._ws = None
+            if stopping.is_set():
+                return
+
+            if self._received or (connected_at is not None and time.monotonic() - connected_at >= self.stable_after):
+                attempt = 0
+            self.stats['disconnects'] += 1
+            delay = self.backoff_delay(attempt)
+            attempt += 1
+            self.stats['retry_attempt'] = attempt
+            print(f"WebSocket disconnected; reconnecting in {delay:.1f}s")
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _consume(self, ws):
+        async for message in ws:
+            self._received = True
+            self.stats['messages'] += 1
+            try:
+                quotes = parse_quote_message(message)
+            except Exception as e:
+                print(f"Error processing message: {e}")
+                continue
+            for symbol, price, volume, sent_at in quotes:
+                # Drop quotes for symbols unsubscribed while messages were in flight
+                if symbol in self.symbols:
+                    await self.on_quote(symbol, price, volume, sent_at)